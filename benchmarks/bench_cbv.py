@@ -0,0 +1,119 @@
+"""类视图与普通函数端点的调度开销对比
+
+各个端点依赖相同的 3 个参数, 顺序发送请求, 比较单次请求的耗时;
+单例的类视图只有端点的参数在每个请求中解析
+
+    python benchmarks/bench_cbv.py
+"""
+
+import asyncio
+from time import perf_counter
+from typing import Annotated
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from fastapi_exts.cbv import CBV
+
+
+NUMBER = 5000
+
+
+async def get_user():
+    return {"id": 1}
+
+
+async def get_tenant():
+    return "default"
+
+
+async def get_flags():
+    return frozenset({"a", "b"})
+
+
+def create_app():
+    app = FastAPI()
+    cbv = CBV(app)
+
+    @app.get("/function")
+    async def function(
+        user: Annotated[dict, Depends(get_user)],
+        tenant: Annotated[str, Depends(get_tenant)],
+        flags: Annotated[frozenset, Depends(get_flags)],
+    ):
+        return [user["id"], tenant, len(flags)]
+
+    @cbv
+    class Routes:
+        user: Annotated[dict, Depends(get_user)]
+        tenant: Annotated[str, Depends(get_tenant)]
+        flags: Annotated[frozenset, Depends(get_flags)]
+
+        @cbv.get("/cbv")
+        async def api(self):
+            return [self.user["id"], self.tenant, len(self.flags)]
+
+    @cbv
+    class SlotsRoutes:
+        __slots__ = ("flags", "tenant", "user")
+
+        user: Annotated[dict, Depends(get_user)]
+        tenant: Annotated[str, Depends(get_tenant)]
+        flags: Annotated[frozenset, Depends(get_flags)]
+
+        @cbv.get("/cbv-slots")
+        async def api(self):
+            return [self.user["id"], self.tenant, len(self.flags)]
+
+    singleton_cbv = CBV(app, lifetime="singleton")
+
+    @singleton_cbv
+    class SingletonRoutes:
+        flags: Annotated[frozenset, Depends(get_flags)]
+
+        @singleton_cbv.get("/cbv-singleton")
+        async def api(
+            self,
+            user: Annotated[dict, Depends(get_user)],
+            tenant: Annotated[str, Depends(get_tenant)],
+        ):
+            return [user["id"], tenant, len(self.flags)]
+
+    pooled_cbv = CBV(app, lifetime="pooled")
+
+    @pooled_cbv
+    class PooledRoutes:
+        user: Annotated[dict, Depends(get_user)]
+        tenant: Annotated[str, Depends(get_tenant)]
+        flags: Annotated[frozenset, Depends(get_flags)]
+
+        @pooled_cbv.get("/cbv-pooled")
+        async def api(self):
+            return [self.user["id"], self.tenant, len(self.flags)]
+
+    return app
+
+
+async def main():
+    transport = httpx.ASGITransport(create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for path in [
+            "/function",
+            "/cbv",
+            "/cbv-slots",
+            "/cbv-singleton",
+            "/cbv-pooled",
+        ]:
+            await client.get(path)
+
+            start = perf_counter()
+            for _ in range(NUMBER):
+                await client.get(path)
+            elapsed = perf_counter() - start
+            print(f"{path}: {elapsed / NUMBER * 1e6:.1f} us/request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
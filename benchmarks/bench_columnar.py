@@ -0,0 +1,69 @@
+"""对象与列式结果的大小, 编码和解析耗时对比
+
+100 行的 `APIPage`, 分别以对象列表和列式输出
+
+    python benchmarks/bench_columnar.py
+"""
+
+import json
+from datetime import UTC, datetime
+from timeit import timeit
+
+from fastapi_exts.models import APIModel
+from fastapi_exts.pagination import (
+    APIPageParamsModel,
+    PageResponse,
+    api_page,
+)
+
+
+NUMBER = 2000
+
+
+class Item(APIModel):
+    item_id: int
+    display_name: str
+    created_at: datetime
+    owner_email: str
+    is_active: bool
+    total_score: float
+
+
+def create_page(page_size: int):
+    rows = [
+        {
+            "item_id": i,
+            "display_name": f"item-{i}",
+            "created_at": datetime(2024, 1, 1, tzinfo=UTC),
+            "owner_email": f"user{i}@example.com",
+            "is_active": i % 2 == 0,
+            "total_score": i / 3,
+        }
+        for i in range(page_size)
+    ]
+    pagination = APIPageParamsModel(page_size=page_size)
+    return api_page(Item, pagination, page_size, rows)
+
+
+def main():
+    for page_size in [10, 100]:
+        result = create_page(page_size)
+        for results_format in ["objects", "columnar"]:
+            body = PageResponse(result, results_format=results_format).body
+            encode = timeit(
+                lambda r=result, f=results_format: PageResponse(
+                    r, results_format=f
+                ),
+                number=NUMBER,
+            )
+            parse = timeit(lambda b=body: json.loads(b), number=NUMBER)
+            print(
+                f"{page_size} rows {results_format:>8}: "
+                f"{len(body)} bytes, "
+                f"encode {encode / NUMBER * 1e6:.1f}us, "
+                f"parse {parse / NUMBER * 1e6:.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
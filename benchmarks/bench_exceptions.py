@@ -0,0 +1,115 @@
+"""异常从抛出到生成响应的耗时
+
+每一轮的单次耗时应该保持平稳,
+并且不会随着抛出次数的增加而产生新的模型类;
+然后对比默认处理器与缓存响应体的处理器, 以及延迟构建 data 的开销
+
+    python benchmarks/bench_exceptions.py
+"""
+
+import gc
+from time import perf_counter
+
+from pydantic import BaseModel
+
+from fastapi_exts.exceptions import (
+    HTTPProblem,
+    NamedHTTPError,
+    create_ext_http_error_handler,
+    ext_http_error_handler,
+)
+
+
+class NotFoundError(NamedHTTPError):
+    status = 404
+    targets = ("user", "team")
+    message = "{target} not found"
+
+
+class Conflict(HTTPProblem):
+    status = 409
+    title = "Conflict"
+    type = "urn:problem:conflict"
+
+
+ROUNDS = 5
+NUMBER = 10_000
+
+
+def raise_to_response(handler=ext_http_error_handler):
+    try:
+        raise NotFoundError(target="user")
+    except NotFoundError as e:
+        handler(None, e)
+
+    try:
+        raise Conflict(detail="duplicated")
+    except Conflict as e:
+        handler(None, e)
+
+
+def raise_static(handler):
+    try:
+        raise Conflict
+    except Conflict as e:
+        handler(None, e)
+
+
+class LazyConflict(Conflict):
+    __lazy_data__ = True
+
+
+def raise_and_catch(error_class):
+    try:
+        raise error_class(detail="duplicated")
+    except error_class:
+        pass
+
+
+def count_models():
+    return sum(
+        1
+        for i in gc.get_objects()
+        if isinstance(i, type) and issubclass(i, BaseModel)
+    )
+
+
+def main():
+    raise_to_response()
+    before = count_models()
+
+    for round_ in range(1, ROUNDS + 1):
+        start = perf_counter()
+        for _ in range(NUMBER):
+            raise_to_response()
+        elapsed = perf_counter() - start
+        print(f"round {round_}: {elapsed / NUMBER * 1e6:.2f} us/op")
+
+    print(f"new model classes: {count_models() - before}")
+
+    cached_handler = create_ext_http_error_handler()
+    for name, handler in [
+        ("default", ext_http_error_handler),
+        ("cached", cached_handler),
+    ]:
+        for label, fn in [
+            ("dynamic", raise_to_response),
+            ("static", raise_static),
+        ]:
+            start = perf_counter()
+            for _ in range(NUMBER):
+                fn(handler)
+            elapsed = perf_counter() - start
+            print(f"{name} {label}: {elapsed / NUMBER * 1e6:.2f} us/op")
+
+    for error_class in (Conflict, LazyConflict):
+        start = perf_counter()
+        for _ in range(NUMBER):
+            raise_and_catch(error_class)
+        elapsed = perf_counter() - start
+        name = error_class.__name__
+        print(f"{name} raise and catch: {elapsed / NUMBER * 1e6:.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""同步依赖在线程池与事件循环中执行的对比
+
+每个请求依赖 3 个只做少量计算的同步 Provider, 并发发送大量请求
+
+    python benchmarks/bench_inline_provider.py
+"""
+
+import asyncio
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI
+
+from fastapi_exts.provider import Provider
+from fastapi_exts.routing import ExtAPIRouter
+
+
+REQUESTS = 2000
+CONCURRENCY = 500
+
+
+def get_user(user_id: int = 1):
+    return {"id": user_id}
+
+
+def get_tenant(tenant: str = "default"):
+    return tenant.upper()
+
+
+def get_flags():
+    return frozenset({"a", "b"})
+
+
+def create_app():
+    router = ExtAPIRouter()
+
+    @router.get("/threadpool")
+    async def threadpool(
+        user=Provider(get_user),
+        tenant=Provider(get_tenant),
+        flags=Provider(get_flags),
+    ):
+        return [user.value["id"], tenant.value, len(flags.value)]
+
+    @router.get("/inline")
+    async def inline(
+        user=Provider(get_user, inline=True),
+        tenant=Provider(get_tenant, inline=True),
+        flags=Provider(get_flags, inline=True),
+    ):
+        return [user.value["id"], tenant.value, len(flags.value)]
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+async def run(client: httpx.AsyncClient, path: str):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: list[float] = []
+
+    async def request():
+        async with semaphore:
+            start = perf_counter()
+            await client.get(path)
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(request() for _ in range(REQUESTS)))
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    print(
+        f"{path}: {REQUESTS / elapsed:.0f} req/s, "
+        f"p50 {p50:.1f}ms, p99 {p99:.1f}ms"
+    )
+
+
+async def main():
+    transport = httpx.ASGITransport(create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for path in ["/threadpool", "/inline"]:
+            await client.get(path)
+            await run(client, path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
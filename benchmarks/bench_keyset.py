@@ -0,0 +1,95 @@
+"""偏移分页与键集分页在不同深度的查询耗时
+
+使用 SQLite 内存数据库, 按 (created_at, id) 建立索引,
+分别查询第 1 页, 中间和末尾的一页
+
+    python benchmarks/bench_keyset.py
+"""
+
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from fastapi_exts.models import Model
+from fastapi_exts.pagination import (
+    CursorCodec,
+    CursorParamsModel,
+    PageParamsModel,
+)
+from fastapi_exts.sqlalchemy import IDBase, Keyset, page
+
+
+ROWS = 200_000
+PAGE_SIZE = 50
+NUMBER = 20
+
+
+class Base(orm.DeclarativeBase): ...
+
+
+class Item(Base, IDBase[int]):
+    __tablename__ = "item"
+    __table_args__ = (sa.Index("ix_item_created_at_id", "created_at", "id"),)
+
+    created_at: orm.Mapped[datetime]
+
+
+class ItemModel(Model):
+    id: int
+    created_at: datetime
+
+
+def main():
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)  # noqa: DTZ001
+    with engine.begin() as connection:
+        connection.execute(
+            sa.insert(Item),
+            [
+                {"id": i + 1, "created_at": start + timedelta(minutes=i)}
+                for i in range(ROWS)
+            ],
+        )
+
+    keyset = Keyset(Item, Item.created_at, codec=CursorCodec("secret"))
+
+    with orm.Session(engine) as session:
+        for depth in [0, ROWS // 2, ROWS - PAGE_SIZE]:
+            pagination = PageParamsModel.model_construct(
+                page_size=PAGE_SIZE, page_no=depth // PAGE_SIZE + 1
+            )
+            stmt = (
+                sa.select(Item)
+                .order_by(Item.created_at, Item.id)
+                .offset(depth)
+                .limit(PAGE_SIZE)
+            )
+
+            elapsed = perf_counter()
+            for _ in range(NUMBER):
+                page(ItemModel, pagination, ROWS, session.scalars(stmt))
+            elapsed = (perf_counter() - elapsed) / NUMBER
+            print(f"offset {depth}: {elapsed * 1e3:.2f} ms/page")
+
+            # 上一页最后一行的游标
+            cursor = None
+            if depth:
+                last = session.get_one(Item, depth)
+                cursor = keyset.codec.encode(keyset.values(last))
+            pagination = CursorParamsModel.model_construct(
+                page_size=PAGE_SIZE, cursor=cursor
+            )
+
+            elapsed = perf_counter()
+            for _ in range(NUMBER):
+                stmt = keyset.apply(sa.select(Item), pagination)
+                keyset.page(ItemModel, pagination, session.scalars(stmt))
+            elapsed = (perf_counter() - elapsed) / NUMBER
+            print(f"keyset {depth}: {elapsed * 1e3:.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""返回分页模型与 `PageResponse` 的单次请求耗时对比
+
+默认路径由 FastAPI 按 `response_model` 序列化再执行
+`jsonable_encoder`, `PageResponse` 由 pydantic-core 直接输出字节
+
+    python benchmarks/bench_page_response.py
+"""
+
+import asyncio
+from datetime import UTC, datetime
+from time import perf_counter
+
+import httpx
+from fastapi import FastAPI
+
+from fastapi_exts.models import APIModel
+from fastapi_exts.pagination import (
+    APIPage,
+    APIPageParams,
+    PageResponse,
+    api_page,
+)
+
+
+REQUESTS = 2000
+
+
+class Item(APIModel):
+    id: int
+    name: str
+    created_at: datetime
+    tags: list[str]
+    score: float
+
+
+ROWS = [
+    {
+        "id": i,
+        "name": f"item-{i}",
+        "created_at": datetime(2024, 1, 1, tzinfo=UTC),
+        "tags": ["a", "b", "c"],
+        "score": i / 3,
+    }
+    for i in range(100)
+]
+
+
+def create_app():
+    app = FastAPI()
+
+    @app.get("/default")
+    async def default(pagination: APIPageParams) -> APIPage[Item]:
+        rows = ROWS[: pagination.page_size]
+        return api_page(Item, pagination, len(ROWS), rows)
+
+    @app.get("/direct", response_class=PageResponse)
+    async def direct(pagination: APIPageParams) -> APIPage[Item]:
+        rows = ROWS[: pagination.page_size]
+        return PageResponse(api_page(Item, pagination, len(ROWS), rows))
+
+    return app
+
+
+async def run(client: httpx.AsyncClient, url: str):
+    await client.get(url)
+    start = perf_counter()
+    for _ in range(REQUESTS):
+        await client.get(url)
+    return (perf_counter() - start) / REQUESTS * 1e6
+
+
+async def main():
+    transport = httpx.ASGITransport(create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for page_size in [10, 50, 100]:
+            default = await run(client, f"/default?pageSize={page_size}")
+            direct = await run(client, f"/direct?pageSize={page_size}")
+            print(
+                f"page size {page_size}: default {default:.0f}us, "
+                f"PageResponse {direct:.0f}us"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
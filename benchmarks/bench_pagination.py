@@ -0,0 +1,73 @@
+"""分页结果的校验耗时
+
+宽模型 (20 个字段) 每页 100 行, 分别使用映射, NamedTuple 和 ORM 对象
+作为查询结果, 对比逐行 `model_validate` 后再构建 `Page` 的旧实现
+
+    python benchmarks/bench_pagination.py
+"""
+
+from collections import namedtuple
+from math import ceil
+from time import perf_counter
+
+from pydantic import create_model
+
+from fastapi_exts.models import Model
+from fastapi_exts.pagination import Page, PageParamsModel, page
+
+
+FIELDS = 20
+ROWS = 100
+NUMBER = 1000
+
+Item = create_model(
+    "Item",
+    __base__=Model,
+    id=(int, ...),
+    **{f"field_{i}": (str, ...) for i in range(FIELDS - 1)},
+)
+
+ItemTuple = namedtuple("ItemTuple", list(Item.model_fields))  # noqa: PYI024
+
+
+class ItemObject:
+    def __init__(self, **kwds) -> None:
+        self.__dict__.update(kwds)
+
+
+def legacy_page(model_class, pagination, count, results):
+    results_ = [model_class.model_validate(i) for i in results]
+    return Page[model_class](
+        page_size=pagination.page_size,
+        page_no=pagination.page_no,
+        page_count=ceil(count / pagination.page_size),
+        count=count,
+        results=results_,
+    )
+
+
+def main():
+    rows = [
+        {"id": i, **{f"field_{j}": f"value {j}" for j in range(FIELDS - 1)}}
+        for i in range(ROWS)
+    ]
+    inputs = {
+        "mapping": rows,
+        "namedtuple": [ItemTuple(**i) for i in rows],
+        "orm": [ItemObject(**i) for i in rows],
+    }
+    pagination = PageParamsModel(page_size=ROWS)
+
+    for name, results in inputs.items():
+        for label, fn in [("legacy", legacy_page), ("batched", page)]:
+            fn(Item, pagination, 1000, results)
+
+            start = perf_counter()
+            for _ in range(NUMBER):
+                fn(Item, pagination, 1000, results)
+            elapsed = perf_counter() - start
+            print(f"{name} {label}: {elapsed / NUMBER * 1e6:.1f} us/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""连接池计时的开销
+
+对比有无 `instrument_pool` 时, 取出并归还一个连接的耗时,
+以及会话执行一条查询的耗时
+
+    python benchmarks/bench_pool_instrumentation.py
+"""
+
+from timeit import repeat
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from fastapi_exts.sqlalchemy.instrumentation import (
+    RequestTiming,
+    instrument_pool,
+    track_session,
+)
+
+
+NUMBER = 5000
+
+
+def create_engine():
+    return sa.create_engine("sqlite://", poolclass=sa.QueuePool)
+
+
+def checkout(engine: sa.Engine, timing: RequestTiming | None):
+    with engine.connect() as connection:
+        if timing is not None:
+            timing.attach(connection.info)
+
+
+def query(sessionmaker: orm.sessionmaker, timing: RequestTiming | None):
+    with sessionmaker() as session:
+        if timing is not None:
+            track_session(session, timing)
+        session.execute(sa.text("SELECT 1"))
+
+
+def main():
+    plain = create_engine()
+    instrumented = create_engine()
+    instrument_pool(instrumented)
+
+    for name, func in [("checkout", checkout), ("session query", query)]:
+        results = {}
+        for label, engine, timing in [
+            ("plain", plain, None),
+            ("instrumented", instrumented, RequestTiming("db")),
+        ]:
+            target = engine if func is checkout else orm.sessionmaker(engine)
+            func(target, timing)
+            elapsed = min(
+                repeat(
+                    lambda f=func, t=target, r=timing: f(t, r),
+                    number=NUMBER,
+                    repeat=5,
+                )
+            )
+            results[label] = elapsed / NUMBER * 1e6
+
+        print(
+            f"{name}: plain {results['plain']:.1f}us, "
+            f"instrumented {results['instrumented']:.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""注册大量路由的启动耗时
+
+构造一个 2000 个路由的应用, 这些路由共享几十个异常类,
+以及一个嵌套的 "当前用户" 依赖
+
+    python benchmarks/bench_startup.py
+"""
+
+from time import perf_counter
+
+from fastapi import FastAPI
+
+from fastapi_exts.exceptions import HTTPProblem, NamedHTTPError
+from fastapi_exts.provider import Provider
+from fastapi_exts.responses import build_responses
+from fastapi_exts.routing import ExtAPIRouter
+
+
+ROUTES = 2000
+ERRORS = 40
+
+
+def create_errors():
+    errors = []
+    for i in range(ERRORS):
+        status = 400 + i % 10
+        if i % 2:
+            error = type(f"Error{i}", (NamedHTTPError,), {"status": status})
+        else:
+            error = type(
+                f"Problem{i}",
+                (HTTPProblem,),
+                {"status": status, "title": f"Problem {i}"},
+            )
+        errors.append(error)
+    return errors
+
+
+def route_exceptions(errors: list, index: int):
+    return [errors[(index + i) % ERRORS] for i in range(0, ERRORS, 10)]
+
+
+def get_session():
+    return None
+
+
+def get_user(session=Provider(get_session)):
+    return session.value
+
+
+def create_app(errors: list):
+    router = ExtAPIRouter()
+    current_user = Provider(get_user, exceptions=errors[:2])
+
+    for i in range(ROUTES):
+        exceptions = route_exceptions(errors, i)
+        provider = Provider(lambda: 1, exceptions=exceptions)
+
+        def endpoint(value=provider, user=current_user):
+            return value.value, user.value
+
+        router.add_api_route(
+            f"/items/{i}",
+            endpoint,
+            responses=None,
+        )
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def main():
+    errors = create_errors()
+
+    start = perf_counter()
+    for i in range(ROUTES):
+        build_responses(*route_exceptions(errors, i))
+    print(f"build_responses x {ROUTES}: {perf_counter() - start:.3f}s")
+
+    start = perf_counter()
+    app = create_app(errors)
+    print(f"register {ROUTES} routes: {perf_counter() - start:.3f}s")
+
+    start = perf_counter()
+    app.openapi()
+    print(f"openapi: {perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""流式响应与完整分页的内存峰值对比
+
+分别用 `page` 和 `stream_page` 编码相同数量的结果,
+使用 tracemalloc 记录编码过程中的内存峰值
+
+    python benchmarks/bench_stream.py
+"""
+
+import asyncio
+import tracemalloc
+from time import perf_counter
+
+from fastapi_exts.models import Model
+from fastapi_exts.pagination import PageParamsModel, page, stream_page
+
+
+class Item(Model):
+    id: int
+    name: str
+    score: float
+
+
+def rows(count: int):
+    for i in range(count):
+        yield {"id": i, "name": f"item-{i}", "score": i / 3}
+
+
+def full_page(count: int) -> int:
+    pagination = PageParamsModel(page_size=100, page_no=1)
+    body = page(Item, pagination, count, rows(count)).model_dump_json()
+    return len(body)
+
+
+def streamed(count: int) -> int:
+    response = stream_page(Item, rows(count), batch_size=500)
+
+    async def consume():
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        return size
+
+    return asyncio.run(consume())
+
+
+def measure(name: str, func, count: int):
+    tracemalloc.start()
+    start = perf_counter()
+    size = func(count)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name} {count} rows: {size / 1e6:.1f}MB body, "
+        f"peak {peak / 1e6:.1f}MB, {elapsed:.2f}s"
+    )
+
+
+def main():
+    for count in [10_000, 50_000, 200_000]:
+        measure("page  ", full_page, count)
+        measure("stream", streamed, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from time import monotonic
+from typing import Any, Generic, NamedTuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class _Missing: ...
+
+
+MISSING: Any = _Missing()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class TTLCache(Generic[K, V]):
+    """带过期时间的 LRU 缓存, 线程安全
+
+    :param maxsize: 最大缓存数量, 超出时淘汰最久未使用的值
+    :param ttl: 过期时间 (秒), 为 None 时永不过期
+    """
+
+    def __init__(self, *, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data: OrderedDict[K, tuple[float | None, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        key: K,
+        default: Any = MISSING,
+        *,
+        record: bool = True,
+    ) -> V | Any:
+        """获取缓存的值, 不存在或已过期时返回 `default`
+
+        :param record: 是否计入命中和未命中的次数
+        """
+
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is not MISSING:
+                expires, value = item
+                if expires is None or expires > monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += record
+                    return value
+
+                del self._data[key]
+                self.evictions += 1
+
+            self.misses += record
+            return default
+
+    def set(self, key: K, value: V) -> None:
+        expires = None if self.ttl is None else monotonic() + self.ttl
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._data),
+        )
@@ -1,7 +1,7 @@
-import ast
 import inspect
-from collections.abc import Generator
-from typing import Annotated, TypeGuard, get_args, get_origin
+from collections.abc import Callable, Generator, Sequence
+from typing import Annotated, ClassVar, TypeGuard, get_args, get_origin
+from weakref import WeakKeyDictionary
 
 from fastapi import params
 
@@ -27,6 +27,50 @@ def get_dependency_from_annotated(
 _Dependency = params.Param | params.Body | params.Depends
 
 
+_ClassDependency = tuple[
+    str,
+    _Dependency | Provider | type[inspect.Parameter.empty],
+    type | type[inspect.Parameter.empty],
+]
+
+
+def _iter_classes(cls: type):
+    for c in inspect.getmro(cls):
+        if c is object:
+            return
+        yield c
+
+
+def _is_class_var(annotation) -> bool:
+    if isinstance(annotation, str):
+        # 延迟求值的注解
+        return annotation.startswith(("ClassVar", "typing.ClassVar"))
+    return annotation is ClassVar or get_origin(annotation) is ClassVar
+
+
+def _iter_class_annotations(cls: type):
+    """遍历类及其基类中可能是依赖的注解, 跳过 `ClassVar`
+
+    基类中只有依赖标记 (带 `Depends` 的 `Annotated`, 或值是依赖)
+    的注解, 其余的注解 (例如实例属性的声明) 不作为依赖
+    """
+
+    for c in _iter_classes(cls):
+        values = vars(c)
+        for name, type_ in inspect.get_annotations(c).items():
+            if _is_class_var(type_):
+                continue
+            if (
+                c is cls
+                or (
+                    get_origin(type_) is Annotated
+                    and get_dependency_from_annotated(type_) is not None
+                )
+                or isinstance(values.get(name), _Dependency | Provider)
+            ):
+                yield name, type_
+
+
 def _get_class_dependencies(cls: type):
     result = dict[
         str,
@@ -42,13 +86,16 @@ def _get_class_dependencies(cls: type):
     def is_annotated(obj) -> TypeGuard[Annotated]:
         return get_origin(obj) is Annotated
 
-    for name, type_ in inspect.get_annotations(cls).items():
+    # 子类的注解优先
+    for name, type_ in _iter_class_annotations(cls):
+        if name in result or name in annotations:
+            continue
         if is_annotated(type_) and (
             dependency := get_dependency_from_annotated(type_)
         ):
-            result.setdefault(name, (dependency[1], dependency[0]))
+            result[name] = (dependency[1], dependency[0])
         else:
-            annotations.setdefault(name, type_)
+            annotations[name] = type_
 
     for name, obj in inspect.getmembers(cls):
         if isinstance(obj, _Dependency):
@@ -68,48 +115,148 @@ def _get_class_dependencies(cls: type):
     return result
 
 
+def _iter_class_names(cls: type):
+    """按类的定义顺序遍历属性名
+
+    每个类中先是带注解的属性, 然后是其余的属性;
+    只有注解的属性不在 `__dict__` 中, 无法还原它与赋值语句的相对顺序
+    """
+
+    seen = set[str]()
+    for c in _iter_classes(cls):
+        annotations = [
+            name
+            for name, type_ in inspect.get_annotations(c).items()
+            if not _is_class_var(type_)
+        ]
+        for name in (*annotations, *vars(c)):
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+
+_class_dependencies: WeakKeyDictionary[type, tuple[_ClassDependency, ...]] = (
+    WeakKeyDictionary()
+)
+
+
+def get_class_dependencies(cls: type) -> tuple[_ClassDependency, ...]:
+    """获取类的依赖, 每个类只分析一次
+
+    只使用 `__annotations__` 和 `__dict__`, 不需要读取源码
+    """
+
+    result = _class_dependencies.get(cls)
+    if result is None:
+        dependencies = _get_class_dependencies(cls)
+        result = tuple(
+            (name, *dependencies[name])
+            for name in _iter_class_names(cls)
+            if name in dependencies
+        )
+        _class_dependencies[cls] = result
+    return result
+
+
 def iter_class_dependency(
     cls: type,
-) -> Generator[
-    tuple[
-        str,
-        _Dependency | Provider | inspect.Parameter.empty,
-        type | inspect.Parameter.empty,
-    ],
-    None,
-    None,
-]:
-    dependencies = _get_class_dependencies(cls)
+) -> Generator[_ClassDependency, None, None]:
+    yield from get_class_dependencies(cls)
 
-    for c in inspect.getmro(cls):
-        if c is object:
-            return
 
-        source = inspect.getsource(c)
-        tree = ast.parse(source)
-        class_def = next(
-            (i for i in tree.body if isinstance(i, ast.ClassDef)),
-            None,
+def _iter_slots(cls: type):
+    """遍历实例的所有 slot 属性名"""
+    for c in _iter_classes(cls):
+        slots = vars(c).get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name in {"__dict__", "__weakref__"}:
+                continue
+            # 私有属性名会被改写
+            if name.startswith("__") and not name.endswith("__"):
+                name = f"_{c.__name__.lstrip('_')}{name}"
+            yield name
+
+
+def _reset_lines(cls: type):
+    """清空实例状态的语句"""
+    if cls.__dictoffset__:
+        yield "__self.__dict__.clear()"
+    for name in _iter_slots(cls):
+        yield from (
+            "try:",
+            f"    del __self.{name}",
+            "except AttributeError:",
+            "    pass",
         )
 
-        if class_def is None:
-            continue
 
-        for stmt in class_def.body:
-            if isinstance(stmt, ast.AnnAssign) and isinstance(
-                stmt.target, ast.Name
-            ):
-                token = stmt.target.id
-                if token in dependencies:
-                    dep, typ = dependencies[token]
-                    yield token, dep, typ
-
-            elif (
-                isinstance(stmt, ast.Assign)
-                and stmt.targets
-                and isinstance(stmt.targets[0], ast.Name)
-            ):
-                token = stmt.targets[0].id
-                if token in dependencies:
-                    dep, typ = dependencies[token]
-                    yield token, dep, typ
+# 对象池的端点通过该参数注册归还实例的后台任务
+BACKGROUND_TASKS_ARG = "_cbv_background_tasks"
+
+
+def create_class_constructor(
+    cls: type,
+    names: Sequence[str],
+    *,
+    is_async: bool = False,
+    pool_size: int | None = None,
+) -> Callable:
+    """生成创建类实例的函数
+
+    生成的函数只接收 `names` 中的关键字参数, 依次赋值给实例,
+    如果类定义了 `__post_init__` 则在最后调用,
+    每次请求不再需要遍历字典, 也不需要 `setattr` 和 `getattr`;
+    `__post_init__` 是协程函数时, 生成的总是异步函数
+
+    :param pool_size: 不为 None 时优先从对象池中取出实例
+        (并重新调用 `__init__`), 对象池最多保存 `pool_size` 个实例;
+        生成的函数的 `release` 属性是清空实例的属性并放回对象池的
+        异步函数, 由调用方在实例不再使用之后调用
+    """
+
+    post_init = getattr(cls, "__post_init__", None)
+    async_post_init = inspect.iscoroutinefunction(post_init)
+    is_async = is_async or async_post_init
+
+    arguments = f"*, {', '.join(names)}" if names else ""
+    lines = [f"{'async ' if is_async else ''}def create({arguments}):"]
+
+    if pool_size is None:
+        lines.append("    __self = __cls()")
+    else:
+        lines += [
+            "    try:",
+            "        __self = __pool.pop()",
+            "    except IndexError:",
+            "        __self = __cls()",
+        ]
+        if cls.__init__ is not object.__init__:
+            lines += ["    else:", "        __self.__init__()"]
+
+    lines += [f"    __self.{name} = {name}" for name in names]
+    if async_post_init:
+        lines.append("    await __self.__post_init__()")
+    elif callable(post_init):
+        lines.append("    __self.__post_init__()")
+
+    lines.append("    return __self")
+
+    if pool_size is not None:
+        # 异步函数在事件循环中执行, 不占用线程池
+        lines += [
+            "async def __release(__self):",
+            *(f"    {line}" for line in _reset_lines(cls)),
+            "    if len(__pool) < __pool_size:",
+            "        __pool.append(__self)",
+        ]
+
+    namespace = {"__cls": cls, "__pool": [], "__pool_size": pool_size}
+    exec("\n".join(lines), namespace)  # noqa: S102
+    create = namespace["create"]
+
+    create.__name__ = f"create_{cls.__name__}"
+    create.__qualname__ = f"{cls.__qualname__}.{create.__name__}"
+    create.__module__ = cls.__module__
+    if pool_size is not None:
+        create.release = namespace["__release"]  # type: ignore[attr-defined]
+    return create
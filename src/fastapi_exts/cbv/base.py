@@ -1,18 +1,28 @@
 import inspect
-from collections.abc import Callable
-from functools import wraps
-from typing import Annotated, TypeVar
+from collections.abc import Callable, Hashable
+from functools import update_wrapper
+from typing import Annotated, Literal, TypeVar
 
-from fastapi import APIRouter, FastAPI, params
+from fastapi import APIRouter, BackgroundTasks, FastAPI, params
+from fastapi.dependencies.utils import get_typed_signature
 from fastapi.routing import APIRoute, APIWebSocketRoute
+from starlette.requests import HTTPConnection
 
 from fastapi_exts._utils import Is, new_function
-from fastapi_exts.cbv._utils import iter_class_dependency
-from fastapi_exts.provider import Provider
-from fastapi_exts.responses import Response, build_responses
+from fastapi_exts.cbv._utils import (
+    BACKGROUND_TASKS_ARG,
+    create_class_constructor,
+    iter_class_dependency,
+)
+from fastapi_exts.provider import Provider, check_dependency_outside_request
+from fastapi_exts.responses import (
+    Response,
+    build_responses,
+    copy_responses,
+)
 from fastapi_exts.routing import ExtAPIRouter, analyze_and_update
+from fastapi_exts.routing.utils import analyze_param
 from fastapi_exts.utils import (
-    inject_parameter,
     list_parameters,
     update_signature,
 )
@@ -24,11 +34,105 @@ T = TypeVar("T")
 Fn = TypeVar("Fn", bound=Callable)
 
 
+CBVLifetime = Literal["request", "singleton", "pooled"]
+
+
+# 依赖的闭包引用了类, 弱引用的键也不会被释放, 因此直接使用 dict;
+# 也不能限制大小, 淘汰之后同一个类的路由会使用不同的依赖 (单例会被
+# 创建两次). 基于类的视图在模块中定义, 数量有限
+_class_dependencies: dict[tuple[type, Hashable], tuple[Callable, dict]] = {}
+
+
+def _get_background_tasks_param(fn: Callable) -> str | None:
+    for param in get_typed_signature(fn).parameters.values():
+        annotation = param.annotation
+        if inspect.isclass(annotation) and issubclass(
+            annotation, BackgroundTasks
+        ):
+            return param.name
+    return None
+
+
+def _create_releasing_function(
+    origin: Callable,
+    release: Callable,
+    *,
+    websocket: bool,
+):
+    """端点执行完毕之后归还对象池的实例
+
+    HTTP 端点在最后添加归还实例的后台任务, 排在端点自己添加的任务之后,
+    响应 (包括流式响应) 和这些任务执行完毕之后实例才被清空;
+    端点抛出异常, 或返回的响应自带后台任务 (FastAPI 不再执行
+    `BackgroundTasks`) 时, 实例不会放回对象池;
+    WebSocket 端点返回时连接已经结束, 直接归还
+    """
+
+    self_name = list_parameters(origin)[0].name
+    # FastAPI 只为一个 `BackgroundTasks` 参数注入值, 端点已经声明时共用
+    tasks_name = _get_background_tasks_param(origin) or BACKGROUND_TASKS_ARG
+    pop = tasks_name == BACKGROUND_TASKS_ARG
+
+    if websocket:
+
+        async def websocket_endpoint(**kwds):
+            await origin(**kwds)
+            await release(kwds[self_name])
+
+        return update_wrapper(websocket_endpoint, origin)
+
+    if Is.coroutine_function(origin):
+
+        async def endpoint(**kwds):
+            background_tasks = (
+                kwds.pop(tasks_name) if pop else kwds[tasks_name]
+            )
+            result = await origin(**kwds)
+            background_tasks.add_task(release, kwds[self_name])
+            return result
+
+    else:
+
+        def endpoint(**kwds):
+            background_tasks = (
+                kwds.pop(tasks_name) if pop else kwds[tasks_name]
+            )
+            result = origin(**kwds)
+            background_tasks.add_task(release, kwds[self_name])
+            return result
+
+    return update_wrapper(endpoint, origin)
+
+
 class CBV:
-    def __init__(self, router: APIRouter | FastAPI, /) -> None:
+    def __init__(
+        self,
+        router: APIRouter | FastAPI,
+        /,
+        *,
+        lifetime: CBVLifetime = "request",
+        pool_size: int = 32,
+    ) -> None:
+        """
+        :param lifetime: 类实例的生命周期
+
+            - `request`: 每个请求创建一个实例
+            - `singleton`: 每个应用只创建一个实例,
+              类的依赖只能是非 `request` 作用域的 Provider 或 `Depends`,
+              只解析一次; 端点的参数仍然在每个请求中注入
+            - `pooled`: 实例在响应发送完毕 (包括流式响应和后台任务)
+              之后清空属性并放回对象池, 下个请求取出后重新注入类的依赖;
+              端点返回的响应自带后台任务时, 实例不会放回对象池
+        :param pool_size: `pooled` 对象池最多保存的实例数量
+        """
         self.router = router
+        self.lifetime = lifetime
+        self.pool_size = pool_size
         self._router = ExtAPIRouter()
 
+        self._endpoint_routes: dict[Callable, list[APIRoute]] = {}
+        self._indexed = 0
+
     @property
     def get(self):
         return self._router.get
@@ -75,9 +179,23 @@ class CBV:
         endpoint: Callable,
         handle: Callable[[APIRoute], None | APIRoute],
     ):
-        for route in self._router.routes:
-            if isinstance(route, APIRoute) and route.endpoint == endpoint:
-                handle(route)
+        for route in self._get_endpoint_routes(endpoint):
+            handle(route)
+
+    def _get_endpoint_routes(self, endpoint: Callable) -> list[APIRoute]:
+        """通过索引查找端点的路由
+
+        索引只处理上次查找之后新增的路由, 装饰整个类的耗时是线性的
+        """
+
+        routes = self._router.routes
+        for route in routes[self._indexed :]:
+            if isinstance(route, APIRoute):
+                self._endpoint_routes.setdefault(route.endpoint, []).append(
+                    route
+                )
+        self._indexed = len(routes)
+        return self._endpoint_routes.get(endpoint, [])
 
     def responses(self, *responses: Response) -> Callable[[Fn], Fn]:
         def decorator(fn: Fn) -> Fn:
@@ -97,9 +215,15 @@ class CBV:
         if isinstance(route, APIRoute):
             route.responses.update(build_responses(*provider.exceptions))
 
-    def _create_class_dependencies(self, cls: type):
-        def collect_class_dependencies(**kwds):
-            return kwds
+    def _create_class_dependencies(self, cls: type, *, is_async: bool):
+        """创建实例化类的依赖, 类的依赖即为它的参数"""
+        dependencies = tuple(iter_class_dependency(cls))
+        create = create_class_constructor(
+            cls,
+            [name for name, *_ in dependencies],
+            is_async=is_async,
+            pool_size=self.pool_size if self.lifetime == "pooled" else None,
+        )
 
         parameters = [
             inspect.Parameter(
@@ -108,117 +232,174 @@ class CBV:
                 default=dep,
                 annotation=typ,
             )
-            for name, dep, typ in iter_class_dependency(cls)
+            for name, dep, typ in dependencies
         ]
+        update_signature(create, parameters=parameters)
 
-        update_signature(collect_class_dependencies, parameters=parameters)
+        return create
 
-        return collect_class_dependencies
+    def _create_singleton_dependency(self, cls: type, create: Callable):
+        """由 Provider 在请求之外解析类的依赖, 每个应用只创建一次实例"""
 
-    @staticmethod
-    def _create_class_instance(*, cls: type, **dependencies):
-        """创建类实例"""
-        instance = cls()
-        for k, v in dependencies.items():
-            setattr(instance, k, v)
-
-        post_init = getattr(instance, "__post_init__", None)
-        if callable(post_init):
-            post_init()
+        for name, dep, _ in iter_class_dependency(cls):
+            valid = (
+                dep.scope != "request"
+                if isinstance(dep, Provider)
+                else isinstance(dep, params.Depends)
+                and dep.dependency is not None
+            )
+            if not valid:
+                msg = (
+                    f"Attribute `{name}` of singleton `{cls.__name__}` must "
+                    "be a non-request scoped provider or a dependency"
+                )
+                raise TypeError(msg)
+
+            # 在装饰时检查, 而不是在第一个请求中失败
+            try:
+                check_dependency_outside_request(dep.dependency)
+            except TypeError as e:
+                msg = (
+                    f"Attribute `{name}` of singleton `{cls.__name__}` "
+                    f"can not be resolved outside a request: {e}"
+                )
+                raise TypeError(msg) from e
+
+        provider = Provider(create, scope="app")
+
+        async def singleton_dependency(connection: HTTPConnection):
+            return await provider.resolve(connection.app)
+
+        return singleton_dependency
+
+    def _get_class_dependencies(
+        self, cls: type, *, is_async: bool
+    ) -> tuple[Callable, dict]:
+        """获取实例化类的依赖及其响应
+
+        同一个类的所有路由共用一个依赖, 只创建和分析一次;
+        同步和异步的端点分别使用同步和异步的依赖,
+        使实例与端点在同一个上下文中创建,
+        同步端点的 `__post_init__` 因此在线程池中执行
+        """
+
+        singleton = self.lifetime == "singleton"
+        # 异步的 __post_init__ 总是在事件循环中等待
+        if Is.coroutine_function(getattr(cls, "__post_init__", None)):
+            is_async = True
+
+        # 单例不区分端点的调用方式, 否则会创建两个实例
+        key = (
+            ("singleton",)
+            if singleton
+            else (self.lifetime, self.pool_size, is_async)
+        )
 
-        return instance
+        result = _class_dependencies.get((cls, key))
+        if result is None:
+            class_dependencies = self._create_class_dependencies(
+                cls, is_async=is_async and not singleton
+            )
+            if singleton:
+                extras = [
+                    analyze_param(annotation=typ, value=dep)
+                    for _, dep, typ in iter_class_dependency(cls)
+                ]
+                class_dependencies = self._create_singleton_dependency(
+                    cls, class_dependencies
+                )
+            else:
+                extras = analyze_and_update(class_dependencies)
+
+            responses = {}
+            for i in extras:
+                responses.update(build_responses(*i.exceptions))
+                if i.provider:
+                    responses.update(build_responses(*i.provider.exceptions))
+            result = _class_dependencies[cls, key] = (
+                class_dependencies,
+                responses,
+            )
+        return result
 
     @staticmethod
-    def _empty_dependency(): ...
-
     def _create_instance_function(
-        self,
         origin: Callable,
         cls: type,
         class_dependencies: Callable,
+        *,
+        websocket: bool = False,
     ):
         """创建实例函数"""
-        cls_dep_name = class_dependencies.__name__
-
-        def _flush_arguments(_args: tuple, kwds: dict):
-            kwds.pop("self", None)
-
-        def _create_instance(_args: tuple, kwds: dict):
-            dependencies = kwds.pop(cls_dep_name)
-            return self._create_class_instance(cls=cls, **dependencies)
 
-        fn = new_function(origin)
-
-        # 把 self 转为类型为空依赖的参数
-        # e.g.: (self: Annotated[None, Depends(lambda: None)], ...)
-        no_self_arguments = list_parameters(origin)
-        no_self_arguments[0] = no_self_arguments[0].replace(
-            annotation=Annotated[
-                None,
-                params.Depends(self._empty_dependency),
-            ],
-        )
-        update_signature(fn, parameters=no_self_arguments)
+        release = getattr(class_dependencies, "release", None)
+        if release is None:
+            fn = new_function(origin)
+        else:
+            fn = _create_releasing_function(
+                origin, release, websocket=websocket
+            )
 
-        inject_parameter(
-            fn,
-            name=cls_dep_name,
-            default=params.Depends(class_dependencies),
+        # 把 self 转为创建实例的依赖
+        # e.g.: (self: Annotated[cls, Depends(create_cls)], ...)
+        parameters = list_parameters(origin)
+        parameters[0] = parameters[0].replace(
+            annotation=Annotated[cls, params.Depends(class_dependencies)],
         )
+        if (
+            release is not None
+            and not websocket
+            and _get_background_tasks_param(origin) is None
+        ):
+            parameters.append(
+                inspect.Parameter(
+                    name=BACKGROUND_TASKS_ARG,
+                    kind=inspect.Parameter.KEYWORD_ONLY,
+                    annotation=BackgroundTasks,
+                )
+            )
+        update_signature(fn, parameters=parameters)
 
-        if Is.coroutine_function(origin):
-
-            @wraps(fn)
-            async def async_wrapper(*args, **kwds):
-                _flush_arguments(args, kwds)
-                instance = _create_instance(args, kwds)
-                return await origin(instance, *args, **kwds)
-
-            return async_wrapper
-
-        @wraps(fn)
-        def wrapper(*args, **kwds):
-            _flush_arguments(args, kwds)
-            instance = _create_instance(args, kwds)
-            return origin(instance, *args, **kwds)
-
-        return wrapper
+        return fn
 
     def __call__(self, cls: type[T], /) -> type[T]:
-        api_routes = [
-            (index, i)
-            for index, i in enumerate(self._router.routes)
-            if isinstance(i, APIRoute | APIWebSocketRoute)
-        ]
+        # 类的路由移动到最后, 路由列表只重建一次
+        routes = []
+        class_routes = []
 
-        for _index, route in api_routes:
-            endpoint = route.endpoint
-            if hasattr(cls, endpoint.__name__):
-                self._router.routes.remove(route)
-
-                if isinstance(endpoint, staticmethod):
-                    new_fn = endpoint
-
-                else:
-                    class_dependencies = self._create_class_dependencies(cls)
-                    for i in analyze_and_update(class_dependencies):
-                        responses = {}
-                        responses.update(build_responses(*i.exceptions))
-                        if i.provider:
-                            responses.update(
-                                build_responses(*i.provider.exceptions)
-                            )
-                        if isinstance(route, APIRoute):
-                            route.responses.update(responses)
-                    new_fn = self._create_instance_function(
-                        endpoint, cls, class_dependencies
-                    )
-
-                setattr(route, "endpoint", new_fn)
-
-                self._router.routes.append(route)
+        for route in self._router.routes:
+            if not isinstance(route, APIRoute | APIWebSocketRoute):
+                routes.append(route)
+                continue
 
+            endpoint = route.endpoint
+            if not hasattr(cls, endpoint.__name__):
+                routes.append(route)
+                continue
+
+            if isinstance(endpoint, staticmethod):
+                new_fn = endpoint
+
+            else:
+                class_dependencies, responses = self._get_class_dependencies(
+                    cls, is_async=Is.coroutine_function(endpoint)
+                )
+                if isinstance(route, APIRoute):
+                    route.responses.update(copy_responses(responses))
+                new_fn = self._create_instance_function(
+                    endpoint,
+                    cls,
+                    class_dependencies,
+                    websocket=isinstance(route, APIWebSocketRoute),
+                )
+
+            setattr(route, "endpoint", new_fn)
+            class_routes.append(route)
+
+        self._router.routes = routes + class_routes
         self.router.include_router(self._router)
         self._router.routes = []
+        self._endpoint_routes.clear()
+        self._indexed = 0
 
         return cls
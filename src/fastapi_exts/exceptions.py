@@ -1,6 +1,7 @@
 from abc import ABC
-from collections.abc import Iterable, Mapping
+from collections.abc import Hashable, Iterable, Mapping
 from typing import Any, Generic, Literal, cast
+from weakref import WeakKeyDictionary
 
 from fastapi import status
 from fastapi.responses import Response
@@ -32,19 +33,107 @@ except ModuleNotFoundError:  # pragma: nocover
     orjson = None
 
 
+_schemas: WeakKeyDictionary[type, tuple[Any, type[BaseModel]]] = (
+    WeakKeyDictionary()
+)
+
+
+def get_schema(
+    error: type[HTTPSchemaErrorInterface[BaseModelT_co]],
+) -> type[BaseModelT_co]:
+    """获取异常的响应模型
+
+    模型按异常类缓存, 只有当 `schema_key()` 的结果发生变化时
+    (例如修改了 `code`, `title`, `targets` 等类属性) 才会重新构建
+    """
+
+    schema_key = getattr(error, "schema_key", None)
+    key = schema_key() if schema_key is not None else None
+
+    cached = _schemas.get(error)
+    if cached is not None and cached[0] == key:
+        return cast(type[BaseModelT_co], cached[1])
+
+    schema = error.build_schema()
+    _schemas[error] = (key, schema)
+    return schema
+
+
 class BaseHTTPError(Exception, ABC, HTTPErrorInterface):
     status = status.HTTP_400_BAD_REQUEST
     headers = None
 
     data: Any = None
 
+    def payload_key(self) -> Hashable | None:
+        """响应体的标识
+
+        标识相同的异常会序列化出相同的响应体,
+        返回 None 表示响应体是动态的
+        """
+        return None
+
 
 class BaseHTTPDataError(
     BaseHTTPError,
     ABC,
     HTTPSchemaErrorInterface[BaseModelT_co],
 ):
-    data: BaseModelT_co
+    __lazy_data__: bool = False
+    """为 True 时, 构造异常只记录参数, 首次访问 `data` 时才构建模型"""
+
+    _data: Any = None
+    # `_data` 是否由 `build_data` 构建, 直接赋值的 `data`
+    # 可能包含任意的值, 不能按 `payload_key` 缓存响应体
+    _data_built: bool = False
+
+    def get_data_kwargs(self) -> dict[str, Any]:
+        """构建 `data` 所需的参数
+
+        直接赋值 `data` 的子类可以不实现, 只在需要构建 `data` 时调用
+        """
+        msg = (
+            f"{type(self).__name__} must implement `get_data_kwargs` "
+            "or assign `data`"
+        )
+        raise NotImplementedError(msg)
+
+    def is_static(self) -> bool:
+        """`data` 是否只由类属性构成"""
+        return False
+
+    def build_data(self) -> BaseModelT_co:
+        schema = get_schema(type(self))
+        return schema.model_validate(self.get_data_kwargs())
+
+    def _init_data(self) -> None:
+        if not self.__lazy_data__:
+            self._data = self.build_data()
+            self._data_built = True
+
+    @property
+    def data(self) -> BaseModelT_co:
+        if self._data is None:
+            self._data = self.build_data()
+            self._data_built = True
+        return self._data
+
+    @data.setter
+    def data(self, value: BaseModelT_co):
+        self._data = value
+        self._data_built = False
+
+    def payload_key(self) -> Hashable | None:
+        if not self.is_static() or (
+            self._data is not None and not self._data_built
+        ):
+            return None
+
+        return (
+            type(self),
+            get_schema(type(self)),
+            tuple(self.get_data_kwargs().items()),
+        )
 
 
 class NamedHTTPError(
@@ -64,10 +153,25 @@ class NamedHTTPError(
     - https://docs.pydantic.dev/latest/concepts/models/#dynamic-model-creation
     """
 
+    # 子类可以不调用 `super().__init__()` 而直接赋值 `data`
+    _message: str | None = None
+    _target: str | None = None
+
     @classmethod
     def get_code(cls):
         return cls.code or cls.__name__.removesuffix("Error")
 
+    @classmethod
+    def schema_key(cls) -> tuple:
+        """影响响应模型的类属性, 变化时会重新构建模型"""
+        targets = None if cls.targets is None else tuple(cls.targets)
+        return (
+            cls.get_code(),
+            targets,
+            cls.__schema_name__,
+            cls.__build_schema_kwargs__,
+        )
+
     @classmethod
     def build_schema(cls) -> type[BaseModelT_co]:
         code = cls.get_code()
@@ -92,20 +196,26 @@ class NamedHTTPError(
         target: str | None = None,
         headers: dict[str, str] | None = None,
     ) -> None:
+        self._message = message
+        self._target = target
+        self.headers = headers or self.headers
+
+        self._init_data()
+
+    def get_data_kwargs(self) -> dict[str, Any]:
         kwargs: dict[str, Any] = {
             "code": self.get_code(),
-            "message": message or self.message or "operation failed",
+            "message": self._message or self.message or "operation failed",
         }
 
-        if target:
-            kwargs["target"] = target
-            kwargs["message"] = kwargs["message"].format(target=target)
-
-        schema = self.build_schema()
+        if self._target:
+            kwargs["target"] = self._target
+            kwargs["message"] = kwargs["message"].format(target=self._target)
 
-        self.data = schema(**kwargs)
+        return kwargs
 
-        self.headers = headers or self.headers
+    def is_static(self) -> bool:
+        return not self._message and not self._target
 
     def __str__(self) -> str:
         return f"<{self.__class__.__name__}: {self.status}>"
@@ -127,6 +237,10 @@ class HTTPProblem(BaseHTTPDataError):  # noqa: N818
     - https://docs.pydantic.dev/latest/concepts/models/#dynamic-model-creation
     """
 
+    # 子类可以不调用 `super().__init__()` 而直接赋值 `data`
+    detail: str | None = None
+    instance: str | None = None
+
     def __init__(
         self,
         *,
@@ -136,6 +250,11 @@ class HTTPProblem(BaseHTTPDataError):  # noqa: N818
     ) -> None:
         self.detail = detail
         self.instance = instance
+        self.headers = headers or self.headers
+
+        self._init_data()
+
+    def get_data_kwargs(self) -> dict[str, Any]:
         kwds = {
             "title": self.title,
             "status": self.status,
@@ -146,9 +265,21 @@ class HTTPProblem(BaseHTTPDataError):  # noqa: N818
             kwds["detail"] = self.detail
         if self.instance:
             kwds["instance"] = self.instance
+        return kwds
 
-        self.data = self.build_schema().model_validate(kwds)
-        self.headers = headers or self.headers
+    def is_static(self) -> bool:
+        return not self.detail and not self.instance
+
+    @classmethod
+    def schema_key(cls) -> tuple:
+        """影响响应模型的类属性, 变化时会重新构建模型"""
+        return (
+            cls.type,
+            cls.title,
+            cls.status,
+            cls.__schema_name__,
+            cls.__build_schema_kwargs__,
+        )
 
     @classmethod
     def build_schema(cls):
@@ -181,6 +312,12 @@ class HTTPProblem(BaseHTTPDataError):  # noqa: N818
         return create_model(cls.__schema_name__ or name, **kwargs)
 
 
+def _get_media_type(exc: BaseHTTPError):
+    if isinstance(exc, HTTPProblem):
+        return "application/problem+json"
+    return None
+
+
 def ext_http_error_handler(_, exc: BaseHTTPError):
     headers = getattr(exc, "headers", None)
 
@@ -192,13 +329,52 @@ def ext_http_error_handler(_, exc: BaseHTTPError):
     else:
         content = exc.data
 
-    media_type = None
-    if isinstance(exc, HTTPProblem):
-        media_type = "application/problem+json"
-
     return JSONResponse(
         content,
         status_code=exc.status,
         headers=headers,
-        media_type=media_type,
+        media_type=_get_media_type(exc),
     )
+
+
+def create_ext_http_error_handler(*, cache_size: int = 1024):
+    """创建缓存响应体的异常处理器
+
+    `payload_key()` 不为 None 的异常 (只使用了类属性的 `message`,
+    `title`, `type` 等) 会缓存编码后的响应体, 之后直接返回, 不再序列化;
+    其他异常只做一次 `model_dump_json`, 不经过字典中转
+
+    :param cache_size: 最多缓存的响应体数量
+    """
+
+    cache: dict[Hashable, tuple[bytes, str]] = {}
+
+    def handler(_, exc: BaseHTTPError):
+        headers = getattr(exc, "headers", None)
+
+        if not is_body_allowed_for_status_code(exc.status):
+            return Response(status_code=exc.status, headers=headers)
+
+        key = exc.payload_key()
+        cached = cache.get(key) if key is not None else None
+
+        if cached is None:
+            if not isinstance(exc.data, BaseModel):
+                return ext_http_error_handler(_, exc)
+
+            cached = (
+                exc.data.model_dump_json(exclude_none=True).encode(),
+                _get_media_type(exc) or "application/json",
+            )
+            if key is not None and len(cache) < cache_size:
+                cache[key] = cached
+
+        body, media_type = cached
+        return Response(
+            body,
+            status_code=exc.status,
+            headers=headers,
+            media_type=media_type,
+        )
+
+    return handler
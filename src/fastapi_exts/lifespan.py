@@ -10,6 +10,8 @@ from typing import TypeVar
 
 from fastapi import FastAPI
 
+from fastapi_exts.provider import Provider, app_scope
+
 
 Handler = Callable[
     [FastAPI],
@@ -25,12 +27,15 @@ ContextManager = Callable[
 
 ContextManagerT = TypeVar("ContextManagerT", bound=ContextManager)
 
+ProviderT = TypeVar("ProviderT", bound=Provider)
+
 
 class Lifespan:
     def __init__(self) -> None:
         self.startup_handlers: list[Handler] = []
         self.shutdown_handlers: list[Handler] = []
         self.context_managers: list[ContextManager] = []
+        self.providers: list[Provider] = []
 
     def on_startup(self, fn: HandlerT) -> HandlerT:
         self.startup_handlers.append(fn)
@@ -44,10 +49,22 @@ class Lifespan:
         self.context_managers.append(fn)
         return fn
 
+    def on_provider(self, provider: ProviderT) -> ProviderT:
+        """启动时解析 `app` 或 `singleton` 作用域的依赖
+
+        没有注册的依赖在第一次使用时解析, 两者都在应用关闭时清理
+        """
+        if provider.scope == "request":
+            msg = "request scoped provider can not be resolved on startup"
+            raise ValueError(msg)
+        self.providers.append(provider)
+        return provider
+
     def include(self, lifespan: "Lifespan"):
         self.startup_handlers.extend(lifespan.startup_handlers)
         self.shutdown_handlers.extend(lifespan.shutdown_handlers)
         self.context_managers.extend(lifespan.context_managers)
+        self.providers.extend(lifespan.providers)
 
     @asynccontextmanager
     async def __call__(self, _app: FastAPI):
@@ -56,7 +73,11 @@ class Lifespan:
             if asyncio.iscoroutine(ret):
                 await ret
 
-        async with AsyncExitStack() as stack:
+        # 启动时解析的和请求中解析的依赖都在应用关闭时清理
+        async with app_scope(_app), AsyncExitStack() as stack:
+            for provider in self.providers:
+                await provider.resolve(_app)
+
             for ctx in self.context_managers:
                 i = ctx(_app)
                 if isinstance(i, AbstractContextManager):
@@ -1,10 +1,42 @@
-from collections.abc import Mapping, Sequence
+import hmac
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from functools import lru_cache
+from itertools import islice
 from math import ceil
-from typing import Annotated, Generic, NamedTuple, TypeVar, overload
-
-from fastapi import Depends, Query
-from pydantic import BaseModel, Field, NonNegativeInt, PositiveInt
-
+from operator import itemgetter
+from typing import (
+    Annotated,
+    Any,
+    Generic,
+    Literal,
+    NamedTuple,
+    TypeVar,
+    get_args,
+    overload,
+)
+
+from fastapi import Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import (
+    BaseModel,
+    Field,
+    NonNegativeInt,
+    PositiveInt,
+    TypeAdapter,
+)
+from pydantic_core import from_json, to_json
+from starlette.background import BackgroundTask
+
+from fastapi_exts.exceptions import NamedHTTPError
 from fastapi_exts.models import APIModel
 
 
@@ -38,6 +70,46 @@ class PageParamsModel(BaseModel):
 PageParams = Annotated[PageParamsModel, Depends()]
 
 
+_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _get_list_adapter(model_class: type[BaseModel]) -> TypeAdapter[list]:
+    return TypeAdapter(list[model_class])
+
+
+def validate_results(
+    model_class: type[BaseModelT],
+    results: Iterable,
+) -> list[BaseModelT]:
+    """校验查询结果
+
+    使用按模型缓存的 `TypeAdapter(list[model_class])`,
+    整页结果在 pydantic-core 中一次完成校验
+    """
+
+    adapter = _get_list_adapter(model_class)
+
+    if not isinstance(results, list):
+        results = list(results)
+    return adapter.validate_python(results)
+
+
+def _page_fields(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    count: int,
+    results: Iterable,
+) -> dict[str, Any]:
+    return {
+        "page_size": pagination.page_size,
+        "page_no": pagination.page_no,
+        "page_count": ceil(count / pagination.page_size),
+        "count": count,
+        "results": validate_results(model_class, results),
+    }
+
+
 @overload
 def page(
     model_class: type[BaseModelT],
@@ -71,13 +143,9 @@ def page(
     count: int,
     results,
 ) -> Page[BaseModelT]:
-    results_ = [model_class.model_validate(i) for i in results]
-    return Page[BaseModelT](
-        page_size=pagination.page_size,
-        page_no=pagination.page_no,
-        page_count=ceil(count / pagination.page_size),
-        count=count,
-        results=results_,
+    # 结果已经校验过了, 不需要再校验一次
+    return Page[model_class].model_construct(
+        **_page_fields(model_class, pagination, count, results)
     )
 
 
@@ -123,11 +191,561 @@ def api_page(
     count: int,
     results,
 ) -> APIPage[BaseModelT]:
-    results_ = [model_class.model_validate(i) for i in results]
-    return APIPage[BaseModelT](
-        page_size=pagination.page_size,
-        page_no=pagination.page_no,
-        page_count=ceil(count / pagination.page_size),
-        count=count,
-        results=results_,
+    return APIPage[model_class].model_construct(
+        **_page_fields(model_class, pagination, count, results)
+    )
+
+
+ResultsFormat = Literal["objects", "columnar"]
+
+_RESULTS_FORMAT_DESCRIPTION = """results format, overrides the `format` \
+parameter of the `Accept` header \
+(e.g. `Accept: application/json; format=columnar`)
+
+- `objects`: `results` is a list of objects (default)
+- `columnar`: `results` is `{"fields": [...], "rows": [[...], ...]}`, \
+each row lists the values in the order of `fields`
+"""
+
+
+class ResultsFormatChoice(NamedTuple):
+    format: ResultsFormat
+    negotiated: bool
+    """是否由 `Accept` 决定, 此时响应需要 `Vary: Accept`"""
+
+
+def get_results_format(
+    request: Request,
+    results_format: Annotated[
+        ResultsFormat | None,
+        Query(alias="format", description=_RESULTS_FORMAT_DESCRIPTION),
+    ] = None,
+) -> ResultsFormatChoice:
+    """从查询参数 `format` 或 `Accept` 的 `format` 参数中获取结果的格式
+
+    如 `?format=columnar` 或 `Accept: application/json; format=columnar`
+    """
+
+    if results_format is not None:
+        return ResultsFormatChoice(results_format, negotiated=False)
+
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = media_range.split(";")
+        if media_type.strip() not in {"application/json", "*/*"}:
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "format" and value.strip() == "columnar":
+                return ResultsFormatChoice("columnar", negotiated=True)
+    return ResultsFormatChoice("objects", negotiated=True)
+
+
+ResultsFormatParam = Annotated[
+    ResultsFormatChoice, Depends(get_results_format)
+]
+
+
+class _Columns(NamedTuple):
+    names: tuple[str, ...]
+    aliases: tuple[str, ...]
+    getter: Callable[[Any], tuple]
+    adapter: TypeAdapter[list[tuple]]
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _get_columns(model_class: type[BaseModel]) -> _Columns:
+    fields = {
+        name: field
+        for name, field in model_class.model_fields.items()
+        if not field.exclude
+    }
+    names = tuple(fields)
+
+    # 字段的值保存在实例的 `__dict__` 中, 多个键时 `itemgetter` 返回元组
+    if len(names) == 1:
+        name = names[0]
+        getter = lambda row: (row.__dict__[name],)  # noqa: E731
+    elif names:
+        get_values = itemgetter(*names)
+        getter = lambda row: get_values(row.__dict__)  # noqa: E731
+    else:
+        getter = lambda _: ()  # noqa: E731
+
+    types = tuple(
+        Annotated[(field.annotation, *field.metadata)]
+        if field.metadata
+        else field.annotation
+        for field in fields.values()
+    )
+    return _Columns(
+        names=names,
+        aliases=tuple(
+            field.serialization_alias or field.alias or name
+            for name, field in fields.items()
+        ),
+        getter=getter,
+        adapter=TypeAdapter(list[tuple[types]] if types else list[tuple]),
+    )
+
+
+def dump_columnar(content: BaseModel, *, by_alias: bool = True) -> bytes:
+    """将分页模型序列化为列式的 JSON
+
+    `results` 输出为 `{"fields": [...], "rows": [[...], ...]}`,
+    每一行是按 `fields` 排列的值, 直接从模型实例中读取,
+    不会为每一行构建字典; 模型的 `field_serializer`
+    和计算字段不会输出
+    """
+
+    page_class = type(content)
+    field = page_class.model_fields["results"]
+    (model_class,) = get_args(field.annotation)
+    columns = _get_columns(model_class)
+
+    meta = content.__pydantic_serializer__.to_json(
+        content, by_alias=by_alias, exclude={"results"}
+    )
+    key = field.serialization_alias or field.alias if by_alias else None
+    rows = columns.adapter.dump_json(
+        list(map(columns.getter, content.results)),
+        by_alias=by_alias,
+    )
+    results = b"".join(
+        [
+            to_json(key or "results"),
+            b':{"fields":',
+            to_json(columns.aliases if by_alias else columns.names),
+            b',"rows":',
+            rows,
+            b"}}",
+        ]
+    )
+    return meta[:-1] + (b"," if len(meta) > 2 else b"") + results  # noqa: PLR2004
+
+
+class PageResponse(JSONResponse):
+    """直接将分页模型序列化为 JSON 的响应
+
+    端点返回 `Page` 等模型时, FastAPI 会按 `response_model`
+    校验并序列化一遍, 再对每一行执行 `jsonable_encoder`;
+    返回 `PageResponse` 时跳过这些步骤, 由 pydantic-core 直接序列化,
+    默认按别名输出, 与 FastAPI 的 `response_model_by_alias` 一致
+
+    OpenAPI 中的响应模型仍由 `response_model` 或返回值注解声明,
+    作为 `response_class` 时文档中的媒体类型为 `application/json`
+
+    ```python
+    @router.get("/users", response_class=PageResponse)
+    def get_users(
+        pagination: APIPageParams,
+        results_format: ResultsFormatParam,
+    ) -> APIPage[UserModel]:
+        result = api_page(UserModel, pagination, count, users)
+        return PageResponse(result, results_format=results_format)
+    ```
+
+    :param results_format: `columnar` 时结果以列式输出, 见
+        `dump_columnar`; 传入 `ResultsFormatParam` 的值时,
+        由 `Accept` 决定的格式会添加 `Vary: Accept` 响应头
+    """
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        *,
+        by_alias: bool = True,
+        results_format: ResultsFormat | ResultsFormatChoice = "objects",
+    ) -> None:
+        negotiated = False
+        if isinstance(results_format, ResultsFormatChoice):
+            results_format, negotiated = results_format
+
+        self.by_alias = by_alias
+        self.results_format = results_format
+        super().__init__(content, status_code, headers, background=background)
+        if negotiated:
+            # 缓存需要按 `Accept` 区分响应
+            self.headers.append("Vary", "Accept")
+
+    def render(self, content: Any) -> bytes:
+        if not isinstance(content, BaseModel):
+            # 作为 `response_class` 时, 端点返回的模型已经被转换为 dict
+            return to_json(content, by_alias=self.by_alias)
+
+        if self.results_format == "columnar":
+            return dump_columnar(content, by_alias=self.by_alias)
+        return content.__pydantic_serializer__.to_json(
+            content, by_alias=self.by_alias
+        )
+
+
+CountStrategyName = Literal["exact", "cached", "estimated", "none"]
+
+
+class StrategyPage(BaseModel, Generic[BaseModelT]):
+    page_size: PositiveInt = Field(description="page size")
+    page_no: PositiveInt = Field(description="page number")
+
+    page_count: NonNegativeInt | None = Field(
+        description="page count, null if count is unknown"
+    )
+    count: NonNegativeInt | None = Field(
+        description="result count, null if count is unknown"
+    )
+    count_strategy: CountStrategyName = Field(
+        description="how count is produced: exact, cached (may be stale), "
+        "estimated, or none"
+    )
+    has_next: bool = Field(description="whether there is a next page")
+
+    results: list[BaseModelT] = Field(description="results")
+
+
+def _strategy_page_fields(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    count: int | None,
+    results: Iterable,
+    count_strategy: CountStrategyName,
+    has_next: bool,  # noqa: FBT001
+) -> dict[str, Any]:
+    return {
+        "page_size": pagination.page_size,
+        "page_no": pagination.page_no,
+        "page_count": None
+        if count is None
+        else ceil(count / pagination.page_size),
+        "count": count,
+        "count_strategy": count_strategy,
+        "has_next": has_next,
+        "results": validate_results(model_class, results),
+    }
+
+
+def strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    count: int | None,
+    results: Iterable,
+    *,
+    count_strategy: CountStrategyName,
+    has_next: bool,
+) -> StrategyPage[BaseModelT]:
+    """构建带有总数来源的分页"""
+
+    return StrategyPage[model_class].model_construct(
+        **_strategy_page_fields(
+            model_class, pagination, count, results, count_strategy, has_next
+        )
+    )
+
+
+class APIStrategyPage(
+    StrategyPage[BaseModelT], APIModel, Generic[BaseModelT]
+): ...
+
+
+def api_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    count: int | None,
+    results: Iterable,
+    *,
+    count_strategy: CountStrategyName,
+    has_next: bool,
+) -> APIStrategyPage[BaseModelT]:
+    return APIStrategyPage[model_class].model_construct(
+        **_strategy_page_fields(
+            model_class, pagination, count, results, count_strategy, has_next
+        )
+    )
+
+
+class CursorPage(BaseModel, Generic[BaseModelT]):
+    page_size: PositiveInt = Field(description="page size")
+    next_cursor: str | None = Field(
+        description="cursor of the next page, null if there is no more"
+    )
+
+    results: list[BaseModelT] = Field(description="results")
+
+
+class CursorParamsModel(BaseModel):
+    page_size: int = Query(
+        50,
+        ge=1,
+        le=100,
+        description="page size",
+    )
+    cursor: str | None = Query(
+        None,
+        description="cursor returned by the previous page",
+    )
+
+
+CursorParams = Annotated[CursorParamsModel, Depends()]
+
+
+class InvalidCursorError(NamedHTTPError):
+    status = 400
+    message = "invalid cursor"
+
+
+class CursorCodec:
+    """游标的编码与解码
+
+    游标是排序列的值经过 JSON 序列化和 HMAC 签名后的 base64 字符串,
+    对客户端不透明, 也无法被篡改
+
+    :param secret: 签名的密钥
+    :param digest_size: 签名的字节数
+    """
+
+    def __init__(self, secret: str | bytes, *, digest_size: int = 16):
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self.digest_size = digest_size
+
+    def _sign(self, payload: bytes) -> bytes:
+        digest = hmac.digest(self._secret, payload, "sha256")
+        return digest[: self.digest_size]
+
+    def encode(self, values: Sequence) -> str:
+        payload = to_json(list(values))
+        cursor = urlsafe_b64encode(self._sign(payload) + payload)
+        return cursor.rstrip(b"=").decode()
+
+    def decode(self, cursor: str) -> list:
+        """解码游标, 游标无效时抛出 `InvalidCursorError`"""
+
+        try:
+            data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        except ValueError as e:
+            raise InvalidCursorError from e
+
+        signature = data[: self.digest_size]
+        payload = data[self.digest_size :]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise InvalidCursorError
+
+        values = from_json(payload)
+        if not isinstance(values, list):
+            raise InvalidCursorError
+        return values
+
+
+def _cursor_page_fields(
+    model_class: type[BaseModelT],
+    pagination: CursorParamsModel,
+    results: Iterable,
+    codec: CursorCodec,
+    key: Callable[[Any], Sequence],
+) -> dict[str, Any]:
+    rows = list(results)
+    next_cursor = None
+    # 查询时多取一行, 用于判断是否还有下一页
+    if len(rows) > pagination.page_size:
+        rows = rows[: pagination.page_size]
+        next_cursor = codec.encode(key(rows[-1]))
+
+    return {
+        "page_size": pagination.page_size,
+        "next_cursor": next_cursor,
+        "results": validate_results(model_class, rows),
+    }
+
+
+def cursor_page(
+    model_class: type[BaseModelT],
+    pagination: CursorParamsModel,
+    results: Iterable,
+    *,
+    codec: CursorCodec,
+    key: Callable[[Any], Sequence],
+) -> CursorPage[BaseModelT]:
+    """构建游标分页
+
+    :param results: 查询结果, 应该比 `page_size` 多取一行
+    :param key: 获取一行结果的排序列的值, 用于生成下一页的游标
+    """
+
+    return CursorPage[model_class].model_construct(
+        **_cursor_page_fields(model_class, pagination, results, codec, key)
+    )
+
+
+class APICursorPage(CursorPage[BaseModelT], APIModel, Generic[BaseModelT]): ...
+
+
+class APICursorParamsModel(CursorParamsModel, APIModel): ...
+
+
+APICursorParams = Annotated[APICursorParamsModel, Depends()]
+
+
+def api_cursor_page(
+    model_class: type[BaseModelT],
+    pagination: CursorParamsModel | APICursorParamsModel,
+    results: Iterable,
+    *,
+    codec: CursorCodec,
+    key: Callable[[Any], Sequence],
+) -> APICursorPage[BaseModelT]:
+    return APICursorPage[model_class].model_construct(
+        **_cursor_page_fields(model_class, pagination, results, codec, key)
+    )
+
+
+class StreamTrailer(BaseModel):
+    page_size: PositiveInt | None = Field(None, description="page size")
+    page_no: PositiveInt | None = Field(None, description="page number")
+    count: NonNegativeInt = Field(description="streamed result count")
+
+
+class APIStreamTrailer(StreamTrailer, APIModel): ...
+
+
+StreamFormat = Literal["json", "ndjson"]
+
+
+def _iter_batches(results: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(results)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def _aiter_batches(
+    results: AsyncIterable,
+    size: int,
+) -> AsyncIterator[list]:
+    batch = []
+    async for i in results:
+        batch.append(i)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _StreamEncoder:
+    """逐批校验和编码结果, 最后输出附带分页信息的结尾"""
+
+    def __init__(
+        self,
+        model_class: type[BaseModel],
+        pagination: PageParamsModel | None,
+        stream_format: StreamFormat,
+        *,
+        by_alias: bool,
+    ) -> None:
+        self.model_class = model_class
+        self.pagination = pagination
+        self.ndjson = stream_format == "ndjson"
+        self.by_alias = by_alias
+        self.count = 0
+
+    def start(self) -> bytes:
+        return b"" if self.ndjson else b'{"results":['
+
+    def encode(self, batch: list) -> bytes:
+        results = validate_results(self.model_class, batch)
+        serializer = self.model_class.__pydantic_serializer__
+
+        if self.ndjson:
+            body = b"".join(
+                serializer.to_json(i, by_alias=self.by_alias) + b"\n"
+                for i in results
+            )
+        else:
+            body = b",".join(
+                serializer.to_json(i, by_alias=self.by_alias) for i in results
+            )
+            if self.count:
+                body = b"," + body
+
+        self.count += len(results)
+        return body
+
+    def end(self) -> bytes:
+        trailer_class = (
+            APIStreamTrailer
+            if isinstance(self.pagination, APIModel)
+            else StreamTrailer
+        )
+        trailer = trailer_class.model_construct(
+            page_size=getattr(self.pagination, "page_size", None),
+            page_no=getattr(self.pagination, "page_no", None),
+            count=self.count,
+        ).model_dump_json(by_alias=True, exclude_none=True)
+
+        if self.ndjson:
+            return b'{"trailer":' + trailer.encode() + b"}\n"
+        # 去掉结尾的对象的大括号, 合并到外层对象中
+        return b"]," + trailer.encode()[1:]
+
+
+def stream_page(
+    model_class: type[BaseModel],
+    results: Iterable | AsyncIterable,
+    *,
+    pagination: PageParamsModel | None = None,
+    stream_format: StreamFormat = "json",
+    batch_size: int = 100,
+    by_alias: bool = True,
+) -> StreamingResponse:
+    """以流的方式返回大量结果
+
+    结果按 `batch_size` 分批校验和编码, 内存占用与结果的总量无关;
+    可以使用 SQLAlchemy 的 `yield_per` 或 `stream()` 逐批读取结果
+
+    - `json`: `{"results": [...], "page_size": ..., "page_no": ...,
+      "count": ...}`, 分页信息在结果之后输出
+    - `ndjson`: 每行一个结果, 最后一行为 `{"trailer": {...}}`
+
+    结果在端点返回之后才读取, 提供结果的会话或连接需要在响应结束之后
+    再关闭
+
+    ```python
+    @router.get("/export")
+    def export():
+        def rows():
+            with sessionmaker() as session:
+                stmt = sa.select(User).execution_options(yield_per=500)
+                yield from session.scalars(stmt)
+
+        return stream_page(UserModel, rows(), stream_format="ndjson")
+    ```
+
+    :param results: 同步或异步的可迭代对象,
+        同步的迭代在线程池中执行
+    :param pagination: 分页参数, 会输出到结尾中
+    """
+
+    encoder = _StreamEncoder(
+        model_class,
+        pagination,
+        stream_format,
+        by_alias=by_alias,
+    )
+
+    def iter_body() -> Iterator[bytes]:
+        yield encoder.start()
+        for batch in _iter_batches(results, batch_size):
+            yield encoder.encode(batch)
+        yield encoder.end()
+
+    async def aiter_body() -> AsyncIterator[bytes]:
+        yield encoder.start()
+        async for batch in _aiter_batches(results, batch_size):
+            yield encoder.encode(batch)
+        yield encoder.end()
+
+    return StreamingResponse(
+        aiter_body() if isinstance(results, AsyncIterable) else iter_body(),
+        media_type="application/x-ndjson"
+        if stream_format == "ndjson"
+        else "application/json",
     )
@@ -1,11 +1,31 @@
-from collections.abc import Awaitable, Callable, Coroutine, Sequence
-from copy import copy
-from typing import Any, Generic, TypeVar, overload
+import asyncio
+import inspect
+import threading
+from collections.abc import Awaitable, Callable, Coroutine, Hashable, Sequence
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from functools import partial, update_wrapper
+from typing import (
+    Annotated,
+    Any,
+    Generic,
+    Literal,
+    TypeVar,
+    get_args,
+    get_origin,
+    overload,
+)
+from weakref import WeakKeyDictionary, WeakSet
 
 from fastapi import params
+from fastapi.concurrency import (
+    contextmanager_in_threadpool,
+    run_in_threadpool,
+)
 from fastapi.dependencies.utils import get_typed_signature
+from starlette.requests import HTTPConnection
 
-from fastapi_exts._utils import _undefined
+from fastapi_exts._utils import Is, _undefined
+from fastapi_exts.cache import MISSING, CacheStats, TTLCache
 from fastapi_exts.interfaces import HTTPErrorInterface
 from fastapi_exts.utils import list_parameters, update_signature
 
@@ -13,6 +33,52 @@ from fastapi_exts.utils import list_parameters, update_signature
 T = TypeVar("T")
 
 
+ProviderScope = Literal["request", "app", "singleton"]
+
+
+class _ScopeState:
+    """非请求作用域依赖的解析结果, 由 Provider 的所有副本共享"""
+
+    __slots__ = ("holders", "locks", "stacks", "values")
+
+    def __init__(self) -> None:
+        self.values: dict[Any, Any] = {}
+        self.stacks: dict[Any, AsyncExitStack] = {}
+        self.locks: dict[Any, asyncio.Lock] = {}
+        # 使用解析结果的应用, 全部关闭之后才清理
+        self.holders: dict[Any, set[Any]] = {}
+
+
+# 正在运行的应用关闭时执行的清理, 由 `app_scope` 设置
+_shutdown_stacks: WeakKeyDictionary[Any, AsyncExitStack] = WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def app_scope(app: Any):
+    """应用的生命周期, 退出时清理该应用解析的非 `request` 作用域依赖
+
+    `Lifespan` 会自动进入; 使用其他 lifespan 的应用需要在其中进入,
+    否则 (Starlette 不再执行 `on_shutdown`) 这些依赖不会被清理;
+    没有自定义 lifespan 的应用通过 `on_shutdown` 清理
+    """
+
+    async with AsyncExitStack() as stack:
+        _shutdown_stacks[app] = stack
+        try:
+            yield
+        finally:
+            _shutdown_stacks.pop(app, None)
+
+
+def _on_app_shutdown(app: Any, callback: Callable[[], Awaitable]) -> None:
+    stack = _shutdown_stacks.get(app)
+    if stack is not None:
+        stack.push_async_callback(callback)
+    else:
+        # 没有自定义 lifespan 时, Starlette 在关闭时执行 `on_shutdown`
+        app.router.on_shutdown.append(callback)
+
+
 class Provider(Generic[T]):
     """创建一个依赖
 
@@ -67,6 +133,8 @@ class Provider(Generic[T]):
         dependency: type[T],
         *,
         use_cache: bool = True,
+        scope: ProviderScope = "request",
+        inline: bool = False,
         exceptions: list[type[HTTPErrorInterface]] | None = None,
     ) -> None: ...
 
@@ -76,6 +144,8 @@ class Provider(Generic[T]):
         dependency: Callable[..., Coroutine[Any, Any, T]],
         *,
         use_cache: bool = True,
+        scope: ProviderScope = "request",
+        inline: bool = False,
         exceptions: list[type[HTTPErrorInterface]] | None = None,
     ) -> None: ...
 
@@ -85,6 +155,8 @@ class Provider(Generic[T]):
         dependency: Callable[..., Awaitable[T]],
         *,
         use_cache: bool = True,
+        scope: ProviderScope = "request",
+        inline: bool = False,
         exceptions: list[type[HTTPErrorInterface]] | None = None,
     ) -> None: ...
 
@@ -94,6 +166,8 @@ class Provider(Generic[T]):
         dependency: Callable[..., T],
         *,
         use_cache: bool = True,
+        scope: ProviderScope = "request",
+        inline: bool = False,
         exceptions: list[type[HTTPErrorInterface]] | None = None,
     ) -> None: ...
 
@@ -106,9 +180,30 @@ class Provider(Generic[T]):
         *,
         use_cache: bool = True,
         scopes: Sequence[str] | None = None,
+        scope: ProviderScope = "request",
+        inline: bool = False,
         exceptions: list[type[HTTPErrorInterface]] | None = None,
     ) -> None:
+        """
+        :param scope: 依赖的生命周期
+
+            - `request`: 由 FastAPI 在每个请求中解析
+            - `app`: 每个应用只解析一次, 应用关闭时清理
+            - `singleton`: 整个进程只解析一次,
+              使用它的应用全部关闭时清理
+
+            非 `request` 的依赖不能依赖请求相关的参数,
+            它的参数只能是同样非 `request` 的 Provider,
+            `Depends` 或者带默认值的参数
+        :param inline: 在事件循环中直接执行同步依赖, 不再调度到线程池,
+            只适用于不会阻塞的依赖
+        """
+        if inline and not Is.coroutine_function(dependency):
+            dependency = _create_inline_dependency(dependency)
+
         self.dependency = dependency
+        self.scope = scope
+        self._state = _ScopeState() if scope != "request" else None
 
         if scopes is not None:
             self.depends = params.Security(
@@ -119,11 +214,402 @@ class Provider(Generic[T]):
 
         self.exceptions: list[type[HTTPErrorInterface]] = exceptions or []
 
+        self._value_dependency: Callable | None = None
+
+    def get_value_dependency(self) -> Callable:
+        """获取返回 `ProviderValue` 的依赖
+
+        同一个 Provider 只会创建一次, 这样各个路由使用的是同一个依赖,
+        FastAPI 的依赖缓存可以对其去重
+        """
+        if self._value_dependency is None:
+            self._value_dependency = create_provider_dependency(self)
+        return self._value_dependency
+
+    def _scope_key(self, app: Any):
+        return None if self.scope == "singleton" else app
+
+    async def resolve(self, app: Any = None) -> T:
+        """解析非 `request` 作用域的依赖, 结果会被保存直到 `aclose`
+
+        :param app: `app` 作用域依赖所属的应用; 不为 None 时,
+            应用关闭时自动调用 `aclose(app)`, 见 `app_scope`
+        """
+
+        state = self._state
+        if state is None:
+            msg = "request scoped provider is resolved by FastAPI"
+            raise RuntimeError(msg)
+
+        key = self._scope_key(app)
+        if app is not None:
+            # 先注册清理, 无法注册时不解析
+            holders = state.holders.setdefault(key, set())
+            if app not in holders:
+                _on_app_shutdown(app, partial(self.aclose, app))
+                holders.add(app)
+
+        try:
+            return state.values[key]
+        except KeyError:
+            pass
+
+        lock = state.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in state.values:
+                stack = AsyncExitStack()
+                try:
+                    value = await _solve_dependency(
+                        self.dependency, app=app, stack=stack
+                    )
+                except BaseException:
+                    await stack.aclose()
+                    raise
+                state.stacks[key] = stack
+                state.values[key] = value
+
+        state.locks.pop(key, None)
+        return state.values[key]
+
+    async def aclose(self, app: Any = None) -> None:
+        """清理 `resolve` 保存的结果
+
+        `singleton` 作用域的依赖只有在使用它的应用全部调用之后才清理,
+        `app` 为 None 时直接清理
+        """
+
+        state = self._state
+        if state is None:
+            return
+
+        key = self._scope_key(app)
+        holders = state.holders.get(key)
+        if app is not None and holders is not None:
+            holders.discard(app)
+            if holders:
+                return
+        state.holders.pop(key, None)
+
+        state.values.pop(key, None)
+        stack = state.stacks.pop(key, None)
+        if stack is not None:
+            await stack.aclose()
+
+
+def _get_annotated_depends(annotation: Any) -> params.Depends | None:
+    if get_origin(annotation) is not Annotated:
+        return None
+
+    for arg in reversed(get_args(annotation)[1:]):
+        if isinstance(arg, params.Depends):
+            return arg
+    return None
+
+
+def check_dependency_outside_request(dependency: Callable) -> None:
+    """检查依赖及其子依赖能否在请求之外解析, 不能时抛出 `TypeError`
+
+    参数只能是非 `request` 的 Provider, `Depends` 或者带默认值的参数,
+    不能是 `Request`, 查询参数等请求相关的参数
+    """
+
+    for name, param in get_typed_signature(dependency).parameters.items():
+        default = param.default
+        depends = _get_annotated_depends(param.annotation)
+
+        if isinstance(default, Provider):
+            if default.scope == "request":
+                msg = (
+                    f"Parameter `{name}` of `{dependency}` is a request "
+                    "scoped provider"
+                )
+                raise TypeError(msg)
+            check_dependency_outside_request(default.dependency)
+
+        elif isinstance(default, params.Depends) or depends is not None:
+            depends = depends or default
+            if depends.dependency is None:
+                msg = f"Parameter `{name}` of `{dependency}` has no dependency"
+                raise TypeError(msg)
+            check_dependency_outside_request(depends.dependency)
+
+        elif default is inspect.Parameter.empty or isinstance(
+            default, params.Param | params.Body
+        ):
+            msg = f"Parameter `{name}` of `{dependency}` can not be resolved"
+            raise TypeError(msg)
+
+
+async def _solve_dependency(
+    dependency: Callable,
+    *,
+    app: Any,
+    stack: AsyncExitStack,
+):
+    """在请求之外解析依赖及其子依赖
+
+    与 FastAPI 一样使用 `app.dependency_overrides` 中覆盖后的依赖
+    """
+
+    if app is not None:
+        overrides = getattr(app, "dependency_overrides", None) or {}
+        dependency = overrides.get(dependency, dependency)
+
+    kwds = {}
+    for name, param in get_typed_signature(dependency).parameters.items():
+        default = param.default
+        depends = _get_annotated_depends(param.annotation)
+
+        if isinstance(default, Provider):
+            if default.scope == "request":
+                msg = (
+                    f"Parameter `{name}` of `{dependency}` is a request "
+                    "scoped provider"
+                )
+                raise TypeError(msg)
+            kwds[name] = ProviderValue(default, await default.resolve(app))
+
+        elif isinstance(default, params.Depends) or depends is not None:
+            depends = depends or default
+            if depends.dependency is None:
+                msg = f"Parameter `{name}` of `{dependency}` has no dependency"
+                raise TypeError(msg)
+            kwds[name] = await _solve_dependency(
+                depends.dependency,
+                app=app,
+                stack=stack,
+            )
+
+        elif default is inspect.Parameter.empty:
+            msg = f"Parameter `{name}` of `{dependency}` can not be resolved"
+            raise TypeError(msg)
+
+    return await _call_dependency(dependency, kwds, stack=stack)
+
+
+async def _call_dependency(
+    dependency: Callable,
+    kwds: dict[str, Any],
+    *,
+    stack: AsyncExitStack,
+):
+    if inspect.isasyncgenfunction(dependency):
+        cm = asynccontextmanager(dependency)(**kwds)
+        return await stack.enter_async_context(cm)
+
+    if inspect.isgeneratorfunction(dependency):
+        cm = contextmanager_in_threadpool(contextmanager(dependency)(**kwds))
+        return await stack.enter_async_context(cm)
+
+    if Is.coroutine_function(dependency):
+        return await dependency(**kwds)
+
+    return await run_in_threadpool(dependency, **kwds)
+
+
+class ProviderValue(Generic[T]):
+    """依赖在单个请求中的值
+
+    每次请求都会创建新的实例, 并发的请求之间不会共享同一个值
+    """
+
+    __slots__ = ("provider", "value")
+
+    def __init__(self, provider: Provider[T], value: T) -> None:
+        self.provider = provider
+        self.value = value
+
+
+def _wrap_dependency(dependency: Callable, wrapper: Callable):
+    """让包装函数拥有与依赖相同并且已经解析过注解的签名"""
+    update_wrapper(wrapper, dependency, updated=())
+    update_signature(
+        wrapper,
+        parameters=get_typed_signature(dependency).parameters.values(),
+    )
+    return wrapper
+
+
+def _create_inline_dependency(dependency: Callable):
+    if inspect.isgeneratorfunction(dependency):
+        context = contextmanager(dependency)
+
+        async def inline_generator_dependency(**kwds):
+            with context(**kwds) as value:
+                yield value
+
+        return _wrap_dependency(dependency, inline_generator_dependency)
+
+    if inspect.isasyncgenfunction(dependency):
+        return dependency
+
+    async def inline_dependency(**kwds):
+        return dependency(**kwds)
+
+    return _wrap_dependency(dependency, inline_dependency)
+
+
+def _default_cache_key(**kwds) -> Hashable:
+    return tuple(
+        (name, value.value if isinstance(value, ProviderValue) else value)
+        for name, value in kwds.items()
+    )
+
+
+class CachedProvider(Provider[T]):
+    """缓存解析结果的依赖
+
+    以子依赖解析出的参数作为键缓存依赖的返回值, 支持过期时间和 LRU 淘汰;
+    同一个键并发未命中时只会调用一次依赖
+
+    ```python
+    def get_settings(tenant_id: int): ...
+
+
+    @router.get("/")
+    def api(settings=CachedProvider(get_settings, ttl=60)):
+        return settings.value
+    ```
+
+    :param ttl: 过期时间 (秒), 为 None 时永不过期
+    :param maxsize: 最大缓存数量
+    :param key: 根据依赖的参数生成缓存键, 默认使用全部参数,
+        参数不可哈希时不缓存
+    """
+
+    def __init__(
+        self,
+        dependency: Callable[..., T] | Callable[..., Awaitable[T]],
+        *,
+        ttl: float | None = None,
+        maxsize: int = 1024,
+        key: Callable[..., Hashable] | None = None,
+        use_cache: bool = True,
+        scopes: Sequence[str] | None = None,
+        inline: bool = False,
+        exceptions: list[type[HTTPErrorInterface]] | None = None,
+    ) -> None:
+        if inspect.isgeneratorfunction(
+            dependency
+        ) or inspect.isasyncgenfunction(dependency):
+            msg = "generator dependency can not be cached"
+            raise TypeError(msg)
+
+        self.cache = TTLCache[Hashable, T](maxsize=maxsize, ttl=ttl)
+        self.cache_key = key or _default_cache_key
+
+        super().__init__(
+            self._create_cached_dependency(dependency),
+            use_cache=use_cache,
+            scopes=scopes,
+            inline=inline,
+            exceptions=exceptions,
+        )
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    def _get_key(self, kwds: dict) -> Hashable | None:
+        key = self.cache_key(**kwds)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _create_cached_dependency(self, dependency: Callable):
+        if Is.coroutine_function(dependency):
+            return self._create_async_cached_dependency(dependency)
+        return self._create_sync_cached_dependency(dependency)
+
+    def _create_async_cached_dependency(self, dependency: Callable):
+        cache = self.cache
+        inflight: dict[Hashable, asyncio.Future] = {}
+
+        async def async_cached_dependency(**kwds):
+            key = self._get_key(kwds)
+            if key is None:
+                return await dependency(**kwds)
+
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+
+            # 已经有相同的键在加载了, 等待它的结果;
+            # 加载被取消时结果为 MISSING, 重新尝试 (可能由自己加载)
+            while (future := inflight.get(key)) is not None:
+                value = await asyncio.shield(future)
+                if value is not MISSING:
+                    return value
+
+            future = asyncio.get_running_loop().create_future()
+            inflight[key] = future
+            try:
+                value = await dependency(**kwds)
+            except asyncio.CancelledError:
+                # 取消只影响当前请求, 不传递给等待者
+                future.set_result(MISSING)
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # 避免没有等待者时出现未获取异常的警告
+                future.exception()
+                raise
+            else:
+                cache.set(key, value)
+                future.set_result(value)
+            finally:
+                inflight.pop(key, None)
+            return value
+
+        return _wrap_dependency(dependency, async_cached_dependency)
+
+    def _create_sync_cached_dependency(self, dependency: Callable):
+        cache = self.cache
+        lock = threading.Lock()
+        key_locks: dict[Hashable, threading.Lock] = {}
+
+        def cached_dependency(**kwds):
+            key = self._get_key(kwds)
+            if key is None:
+                return dependency(**kwds)
+
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+
+            with lock:
+                key_lock = key_locks.setdefault(key, threading.Lock())
+
+            try:
+                with key_lock:
+                    # 等待锁的过程中其他线程可能已经加载完成
+                    value = cache.get(key, record=False)
+                    if value is MISSING:
+                        value = dependency(**kwds)
+                        cache.set(key, value)
+            finally:
+                # 依赖抛出异常时也要移除, 避免锁一直留在字典中
+                with lock:
+                    key_locks.pop(key, None)
+            return value
+
+        return _wrap_dependency(dependency, cached_dependency)
+
 
 def create_provider_dependency(provider: Provider):
-    def dependency(value=None):
-        provider.value = value
-        return provider
+    if provider.scope != "request":
+
+        async def scoped_dependency(connection: HTTPConnection):
+            value = await provider.resolve(connection.app)
+            return ProviderValue(provider, value)
+
+        return scoped_dependency
+
+    # 只是包装值, 使用异步函数避免调度到线程池
+    async def dependency(value=None):
+        return ProviderValue(provider, value)
 
     parameters = list_parameters(dependency)
 
@@ -136,13 +622,26 @@ def create_provider_dependency(provider: Provider):
 def _analyze_provider(*, value: Any) -> None | Provider:
     provider = None
     if isinstance(value, Provider):
-        provider = copy(value)
+        provider = value
 
     return provider
 
 
+_transformed: WeakSet[Callable] = WeakSet()
+
+
 def transform_providers(fn: Callable):
-    """分析并更新函数签名"""
+    """分析并更新函数签名
+
+    每个函数只会处理一次, 重复调用直接返回
+    """
+
+    try:
+        if fn in _transformed:
+            return fn
+        _transformed.add(fn)
+    except TypeError:
+        pass
 
     endpoint_signature = get_typed_signature(fn)
     signature_params = dict(endpoint_signature.parameters.copy())
@@ -150,7 +649,7 @@ def transform_providers(fn: Callable):
     for name, param in signature_params.items():
         provider = _analyze_provider(value=param.default)
         if provider is not None:
-            dependency = create_provider_dependency(provider)
+            dependency = provider.get_value_dependency()
             signature_params[name] = signature_params[name].replace(
                 default=params.Depends(
                     dependency,
@@ -158,8 +657,9 @@ def transform_providers(fn: Callable):
                 )
             )
 
-            # 递归更新
-            transform_providers(provider.dependency)
+            # 递归更新, 非请求作用域的依赖由 Provider 自行解析
+            if provider.scope == "request":
+                transform_providers(provider.dependency)
             continue
 
     update_signature(fn, parameters=signature_params.values())
@@ -1,13 +1,54 @@
+from functools import lru_cache
 from typing import cast
 
 from pydantic import BaseModel
 
+from fastapi_exts.exceptions import get_schema
 from fastapi_exts.interfaces import (
     HTTPErrorInterface,
     HTTPSchemaErrorInterface,
 )
 
 
+# 缓存的数量上限, 动态创建的异常类不会让缓存无限增长
+_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _union(a, b):
+    """合并两个模型, 相同的组合只合并一次, 保证各个路由共享同一个对象"""
+    return a | b
+
+
+def copy_responses(responses: dict) -> dict:
+    """复制响应声明, 修改副本中每个状态码的声明不会影响原字典"""
+
+    return {
+        status: dict(response) if response is not None else None
+        for status, response in responses.items()
+    }
+
+
+def _responses_key(args: tuple) -> tuple | None:
+    """缓存的键
+
+    包含异常当前的状态码和模型, 修改异常的类属性后缓存会失效
+    """
+    key = tuple(
+        (
+            arg,
+            getattr(arg, "status", None),
+            get_schema(arg) if hasattr(arg, "build_schema") else None,
+        )
+        for arg in args
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 def _merge_responses(
     target: dict,
     source: dict,
@@ -17,25 +58,41 @@ def _merge_responses(
         if status in source:
             source_model_class = source[status].get("model")
             if source_model_class and model_class:
-                target[status]["model"] = model_class | source_model_class
+                target[status]["model"] = _union(
+                    model_class, source_model_class
+                )
 
     for status, response in source.items():
         if status not in target:
             target[status] = response
 
 
+@lru_cache(maxsize=_CACHE_SIZE)
+def _cached_error_responses(key: tuple) -> dict[int, None | dict]:
+    return _error_responses(*(arg for arg, *_ in key))
+
+
 def error_responses(
     *errors: type[HTTPErrorInterface | HTTPSchemaErrorInterface[BaseModel]],
+):
+    key = _responses_key(errors)
+    if key is None:
+        return _error_responses(*errors)
+    return copy_responses(_cached_error_responses(key))
+
+
+def _error_responses(
+    *errors: type[HTTPErrorInterface | HTTPSchemaErrorInterface[BaseModel]],
 ):
     result: dict[int, None | dict] = {}
 
     for e in errors:
         if hasattr(e, "build_schema"):
             e = cast(type[HTTPSchemaErrorInterface[BaseModel]], e)
-            schema = e.build_schema()
+            schema = get_schema(e)
             current: None | dict
             if (current := result.get(e.status)) and current.get("model"):
-                current["model"] = current["model"] | schema
+                current["model"] = _union(current["model"], schema)
             elif result.get(e.status) is None:
                 result[e.status] = {"model": schema}
             else:
@@ -53,7 +110,25 @@ Response = (
 )
 
 
+@lru_cache(maxsize=_CACHE_SIZE)
+def _cached_build_responses(key: tuple) -> dict:
+    return _build_responses(*(arg for arg, *_ in key))
+
+
 def build_responses(*responses: Response):
+    """构建路由的 `responses` 参数
+
+    结果按参数缓存 (最多 `_CACHE_SIZE` 个),
+    注册大量共享相同异常的路由时不会重复构建
+    """
+
+    key = _responses_key(responses)
+    if key is None:
+        return _build_responses(*responses)
+    return copy_responses(_cached_build_responses(key))
+
+
+def _build_responses(*responses: Response):
     result = {}
     errors: list[type[HTTPErrorInterface]] = []
 
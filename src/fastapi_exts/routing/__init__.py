@@ -4,7 +4,7 @@ from typing import Any
 from fastapi import routing
 
 from fastapi_exts.responses import build_responses
-from fastapi_exts.routing.utils import analyze_and_update
+from fastapi_exts.routing.utils import analyze_and_update, analyze_endpoint
 
 
 class ExtAPIRoute(routing.APIRoute):
@@ -33,6 +33,14 @@ class ExtWebSocketRoute(routing.APIWebSocketRoute):
 
 
 class ExtAPIRouter(routing.APIRouter):
+    def __init__(self, *args, concurrent_providers: bool = False, **kwds):
+        """
+        :param concurrent_providers: 并发解析路由函数中互不依赖的
+            异步 Provider
+        """
+        super().__init__(*args, **kwds)
+        self.concurrent_providers = concurrent_providers
+
     def add_api_route(
         self,
         path: str,
@@ -41,7 +49,12 @@ class ExtAPIRouter(routing.APIRouter):
         **kwds,
     ):
         responses = responses or {}
-        for i in analyze_and_update(endpoint):
+        # 同一个端点注册到并发设置不同的路由器时, 注册的是它的副本
+        endpoint, extras = analyze_endpoint(
+            endpoint,
+            concurrent=self.concurrent_providers,
+        )
+        for i in extras:
             responses.update(build_responses(*i.exceptions))
             if i.provider:
                 responses.update(build_responses(*i.provider.exceptions))
@@ -1,13 +1,28 @@
+import asyncio
 import inspect
-from collections.abc import Callable
-from copy import copy
+from collections import Counter
+from collections.abc import Callable, Iterable
+from contextlib import AsyncExitStack, suppress
 from typing import Annotated, Any, NamedTuple, get_args, get_origin
+from weakref import WeakKeyDictionary
 
 from fastapi import params
-from fastapi.dependencies.utils import get_typed_signature
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import (
+    get_dependant,
+    get_typed_signature,
+    solve_dependencies,
+)
+from fastapi.exceptions import (
+    RequestValidationError,
+    WebSocketRequestValidationError,
+)
+from starlette.requests import HTTPConnection
+from starlette.websockets import WebSocket
 
+from fastapi_exts._utils import Is, new_function
 from fastapi_exts.exceptions import BaseHTTPError
-from fastapi_exts.provider import Provider, create_provider_dependency
+from fastapi_exts.provider import Provider, ProviderValue
 from fastapi_exts.utils import update_signature
 
 
@@ -31,17 +46,347 @@ def analyze_param(*, annotation: Any, value: Any) -> ParamExtra:
 
     provider = None
     if isinstance(value, Provider):
-        provider = copy(value)
+        provider = value
 
     return ParamExtra(exceptions, provider)
 
 
-def analyze_and_update(fn: Callable[..., Any]) -> list[ParamExtra]:
-    """分析并更新函数签名"""
+def _is_depends_param(param: inspect.Parameter) -> bool:
+    if isinstance(param.default, params.Depends):
+        return True
 
-    endpoint_signature = get_typed_signature(fn)
+    if get_origin(param.annotation) is Annotated:
+        return any(
+            isinstance(arg, params.Depends)
+            for arg in get_args(param.annotation)[1:]
+        )
+    return False
+
+
+def _is_concurrent_provider(provider: Provider) -> bool:
+    if (
+        provider.scope != "request"
+        or isinstance(provider.depends, params.Security)
+        or not Is.coroutine_function(provider.dependency)
+    ):
+        return False
+
+    parameters = get_typed_signature(provider.dependency).parameters
+    return all(
+        p.kind
+        in (
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            inspect.Parameter.KEYWORD_ONLY,
+        )
+        for p in parameters.values()
+    )
+
+
+async def _exit_stack():
+    async with AsyncExitStack() as stack:
+        yield stack
+
+
+async def _solve_overridden(
+    dependency: Callable,
+    *,
+    connection: HTTPConnection,
+    stack: AsyncExitStack,
+):
+    """由 FastAPI 解析被 `app.dependency_overrides` 覆盖的依赖"""
+
+    route = connection.scope.get("route")
+    path = getattr(route, "path_format", "")
+    dependant = Dependant(
+        path=path,
+        dependencies=[get_dependant(path=path, call=dependency, name="value")],
+    )
+    solved = await solve_dependencies(
+        request=connection,  # type: ignore[arg-type]
+        dependant=dependant,
+        dependency_overrides_provider=connection.app,
+        async_exit_stack=stack,
+        embed_body_fields=False,
+    )
+    if solved.errors:
+        if isinstance(connection, WebSocket):
+            raise WebSocketRequestValidationError(solved.errors)
+        raise RequestValidationError(solved.errors)
+    return solved.values["value"]
+
+
+# 合并后的依赖额外需要的参数, 用于解析被覆盖的依赖
+_CONNECTION_ARG = "_fastapi_exts_connection"
+_STACK_ARG = "_fastapi_exts_stack"
+
+
+def _merge_parameters(
+    providers: dict[str, Provider],
+) -> tuple[list[inspect.Parameter], list[tuple[Callable, dict[str, str]]]]:
+    """合并依赖的参数, 返回合并后的参数和各个依赖的参数映射
+
+    参数冲突时抛出 ValueError
+    """
+
+    parameters: dict[str, inspect.Parameter] = {
+        _CONNECTION_ARG: inspect.Parameter(
+            _CONNECTION_ARG,
+            inspect.Parameter.KEYWORD_ONLY,
+            annotation=HTTPConnection,
+        ),
+        _STACK_ARG: inspect.Parameter(
+            _STACK_ARG,
+            inspect.Parameter.KEYWORD_ONLY,
+            default=params.Depends(_exit_stack),
+        ),
+    }
+    calls: list[tuple[Callable, dict[str, str]]] = []
+
+    for index, provider in enumerate(providers.values()):
+        mapping: dict[str, str] = {}
+        signature = get_typed_signature(provider.dependency)
+        for param in signature.parameters.values():
+            # 依赖参数的名称不影响解析, 加上前缀避免冲突;
+            # 其他参数 (query, path 等) 的名称有意义,
+            # 同名的参数共享同一个值
+            if _is_depends_param(param):
+                name = f"_{index}_{param.name}"
+            else:
+                name = param.name
+
+            mapping[param.name] = name
+            param = param.replace(
+                name=name,
+                kind=inspect.Parameter.KEYWORD_ONLY,
+            )
+            if parameters.setdefault(name, param) != param:
+                msg = f"Conflicting parameter `{name}`"
+                raise ValueError(msg)
+        calls.append((provider.dependency, mapping))
+
+    return list(parameters.values()), calls
+
+
+def _create_concurrent_dependency(
+    providers: dict[str, Provider],
+) -> Callable | None:
+    """将多个异步依赖合并为一个依赖
+
+    子依赖仍然由 FastAPI 解析, 依赖本身在各自的任务中并发执行,
+    一个依赖失败时取消其余的依赖; 参数冲突时返回 None
+
+    请求时依赖被 `app.dependency_overrides` 覆盖的, 改为由 FastAPI
+    解析覆盖后的依赖 (原依赖的子依赖依旧会被解析)
+    """
+
+    try:
+        parameters, calls = _merge_parameters(providers)
+    except ValueError:
+        return None
+
+    names = list(providers)
+
+    async def resolve_concurrently(**kwds):
+        connection: HTTPConnection = kwds[_CONNECTION_ARG]
+        overrides = getattr(connection.app, "dependency_overrides", {})
+
+        def call(dependency: Callable, mapping: dict[str, str]):
+            if dependency in overrides:
+                return _solve_overridden(
+                    dependency,
+                    connection=connection,
+                    stack=kwds[_STACK_ARG],
+                )
+            return dependency(**{k: kwds[v] for k, v in mapping.items()})
+
+        tasks = [
+            asyncio.create_task(call(dependency, mapping))
+            for dependency, mapping in calls
+        ]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_EXCEPTION
+            )
+        finally:
+            # 一个依赖失败 (或请求被取消) 时不再等待其余的依赖
+            for task in tasks:
+                task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+        # 与依次解析时一样, 抛出按声明顺序的第一个异常
+        errors = [task.exception() for task in tasks if task in done]
+        for error in errors:
+            if error is not None:
+                raise error
+        return dict(zip(names, (i.result() for i in tasks), strict=True))
+
+    update_signature(resolve_concurrently, parameters=parameters)
+    return resolve_concurrently
+
+
+def _create_pick_dependency(
+    name: str,
+    provider: Provider,
+    group: Callable,
+):
+    async def dependency(values=params.Depends(group)):
+        return ProviderValue(provider, values[name])
+
+    return dependency
+
+
+def _get_depends(param: inspect.Parameter) -> params.Depends | None:
+    if isinstance(param.default, Provider):
+        return param.default.depends
+    if isinstance(param.default, params.Depends):
+        return param.default
+    if get_origin(param.annotation) is Annotated:
+        for arg in reversed(get_args(param.annotation)[1:]):
+            if isinstance(arg, params.Depends):
+                return arg
+    return None
+
+
+def _count_dependencies(
+    parameters: Iterable[inspect.Parameter],
+    counter: Counter[Callable],
+    visited: set[Callable],
+) -> None:
+    """统计依赖树中各个依赖出现的次数, 每个依赖的子依赖只统计一次"""
+
+    for param in parameters:
+        depends = _get_depends(param)
+        if depends is None:
+            continue
+        dependency = depends.dependency
+        if dependency is None:
+            # `Depends()` 使用注解作为依赖
+            dependency = param.annotation
+            if get_origin(dependency) is Annotated:
+                dependency = get_args(dependency)[0]
+        if not callable(dependency):
+            continue
+
+        counter[dependency] += 1
+        if dependency in visited:
+            continue
+        visited.add(dependency)
+        with suppress(ValueError, TypeError):
+            _count_dependencies(
+                get_typed_signature(dependency).parameters.values(),
+                counter,
+                visited,
+            )
+
+
+def _update_concurrent_providers(
+    signature_params: dict[str, inspect.Parameter],
+    providers: dict[str, Provider],
+):
+    # 在依赖树中出现多次的依赖需要 FastAPI 的缓存去重, 不参与并发
+    counter: Counter[Callable] = Counter()
+    _count_dependencies(signature_params.values(), counter, set())
+    providers = {
+        name: provider
+        for name, provider in providers.items()
+        if counter[provider.dependency] == 1
+        and _is_concurrent_provider(provider)
+    }
+    if len(providers) < 2:  # noqa: PLR2004
+        return
+
+    group = _create_concurrent_dependency(providers)
+    if group is None:
+        return
+
+    for name, provider in providers.items():
+        signature_params[name] = signature_params[name].replace(
+            default=params.Depends(
+                _create_pick_dependency(name, provider, group),
+                use_cache=provider.depends.use_cache,
+            )
+        )
+
+
+class _Analysis(NamedTuple):
+    concurrent: bool
+    # 更新前的签名
+    signature: inspect.Signature
+    result: list[ParamExtra]
+
+
+_analyzed: WeakKeyDictionary[Callable, _Analysis] = WeakKeyDictionary()
+
+
+def _get_analysis(fn: Callable[..., Any]) -> _Analysis | None:
+    try:
+        return _analyzed.get(fn)
+    except TypeError:
+        return None
+
+
+def analyze_and_update(
+    fn: Callable[..., Any],
+    *,
+    concurrent: bool | None = None,
+) -> list[ParamExtra]:
+    """分析并更新函数签名
+
+    分析结果按函数缓存, 被多个路由共用的依赖只会分析一次;
+    函数的签名只能按一种方式更新, `concurrent` 与已有的结果不一致时
+    抛出 ValueError, 端点使用 `analyze_endpoint` 获取副本
+
+    :param concurrent: 并发解析函数参数中互不依赖的异步 Provider;
+        为 None 时使用已有的结果, 没有时不并发
+    """
+
+    analysis = _get_analysis(fn)
+    if analysis is None:
+        signature = get_typed_signature(fn)
+        analysis = _Analysis(
+            bool(concurrent),
+            signature,
+            _analyze_and_update(fn, signature, concurrent=bool(concurrent)),
+        )
+        # 无法弱引用的函数不缓存
+        with suppress(TypeError):
+            _analyzed[fn] = analysis
+    elif concurrent is not None and analysis.concurrent != concurrent:
+        msg = f"{fn!r} has been analyzed with concurrent={analysis.concurrent}"
+        raise ValueError(msg)
+    return list(analysis.result)
+
+
+def analyze_endpoint(
+    fn: Callable[..., Any],
+    *,
+    concurrent: bool = False,
+) -> tuple[Callable[..., Any], list[ParamExtra]]:
+    """分析并更新端点的签名, 返回需要注册的端点和分析结果
+
+    端点已经按另一种方式更新过签名时 (例如注册到 `concurrent_providers`
+    不同的路由器), 使用更新前的签名创建副本并更新副本,
+    已经注册的路由不受影响
+    """
+
+    analysis = _get_analysis(fn)
+    if analysis is not None and analysis.concurrent != concurrent:
+        fn = new_function(
+            fn, parameters=analysis.signature.parameters.values()
+        )
+    return fn, analyze_and_update(fn, concurrent=concurrent)
+
+
+def _analyze_and_update(
+    fn: Callable[..., Any],
+    endpoint_signature: inspect.Signature,
+    *,
+    concurrent: bool,
+) -> list[ParamExtra]:
     signature_params = dict(endpoint_signature.parameters.copy())
     result: list[ParamExtra] = []
+    providers: dict[str, Provider] = {}
 
     for name, param in signature_params.items():
         extra = analyze_param(
@@ -50,7 +395,8 @@ def analyze_and_update(fn: Callable[..., Any]) -> list[ParamExtra]:
         )
         result.append(extra)
         if extra.provider is not None:
-            dependency = create_provider_dependency(extra.provider)
+            providers[name] = extra.provider
+            dependency = extra.provider.get_value_dependency()
             signature_params[name] = signature_params[name].replace(
                 default=params.Depends(
                     dependency,
@@ -58,11 +404,16 @@ def analyze_and_update(fn: Callable[..., Any]) -> list[ParamExtra]:
                 )
             )
 
-            result.extend(
-                # 递归更新并获取依赖签名
-                analyze_and_update(extra.provider.dependency)
-            )
+            # 非请求作用域的依赖由 Provider 自行解析, 不需要更新签名
+            if extra.provider.scope == "request":
+                result.extend(
+                    # 递归更新并获取依赖签名
+                    analyze_and_update(extra.provider.dependency)
+                )
             continue
 
+    if concurrent:
+        _update_concurrent_providers(signature_params, providers)
+
     update_signature(fn, parameters=signature_params.values())
     return result
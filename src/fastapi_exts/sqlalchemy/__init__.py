@@ -1,13 +1,60 @@
+from .count import (
+    CachedCount,
+    CountStrategy,
+    EstimatedCount,
+    ExactCount,
+    NoCount,
+)
+from .instrumentation import (
+    PoolInstrument,
+    PoolStats,
+    ServerTimingMiddleware,
+    instrument_pool,
+)
 from .mixins import AuditMixin, IDBase
-from .pagination import api_page, page
+from .pagination import (
+    Keyset,
+    api_page,
+    fetch_api_page,
+    fetch_api_strategy_page,
+    fetch_page,
+    fetch_strategy_page,
+    page,
+)
+from .replicas import (
+    ReplicaSet,
+    RoutingSession,
+    create_routing_session_dependency,
+    read_only,
+    read_write,
+)
 from .session import create_engine_dependency, create_session_dependency
 
 
 __all__ = [
     "AuditMixin",
+    "CachedCount",
+    "CountStrategy",
+    "EstimatedCount",
+    "ExactCount",
     "IDBase",
+    "Keyset",
+    "NoCount",
+    "PoolInstrument",
+    "PoolStats",
+    "ReplicaSet",
+    "RoutingSession",
+    "ServerTimingMiddleware",
     "api_page",
     "create_engine_dependency",
+    "create_routing_session_dependency",
     "create_session_dependency",
+    "fetch_api_page",
+    "fetch_api_strategy_page",
+    "fetch_page",
+    "fetch_strategy_page",
+    "instrument_pool",
     "page",
+    "read_only",
+    "read_write",
 ]
@@ -0,0 +1,271 @@
+import json
+from abc import ABC, abstractmethod
+from collections.abc import Generator, Hashable, Iterable
+from typing import Any, ClassVar, NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from fastapi_exts.cache import MISSING, CacheStats, TTLCache
+from fastapi_exts.pagination import CountStrategyName, PageParamsModel
+
+
+_COUNT_LABEL = "__count__"
+
+
+class Counted(NamedTuple):
+    count: int | None
+    results: list
+    has_next: bool
+    strategy: CountStrategyName
+
+
+# 生成需要执行的语句, 接收执行的结果, 最后返回总数和当前页的结果,
+# 同一个查询流程可以由同步或异步的执行器驱动
+CountQuery = Generator[sa.Executable, sa.Result, Counted]
+
+
+def count_statement(stmt: sa.Select) -> sa.Select:
+    subquery = stmt.order_by(None).limit(None).offset(None).subquery()
+    return sa.select(sa.func.count()).select_from(subquery)
+
+
+def _offset(pagination: PageParamsModel) -> int:
+    return (pagination.page_no - 1) * pagination.page_size
+
+
+def page_statement(stmt: sa.Select, pagination: PageParamsModel):
+    return stmt.limit(pagination.page_size).offset(_offset(pagination))
+
+
+def get_results(rows: Iterable[sa.Row], *, scalars: bool) -> list:
+    if scalars:
+        return [row[0] for row in rows]
+    mappings = (row._mapping for row in rows)  # noqa: SLF001
+    return [
+        {k: v for k, v in mapping.items() if k != _COUNT_LABEL}
+        for mapping in mappings
+    ]
+
+
+def _window_query(
+    stmt: sa.Select,
+    pagination: PageParamsModel,
+    *,
+    scalars: bool,
+) -> CountQuery:
+    """使用 `count(*) OVER ()` 在一条语句中同时查询当前页和总数
+
+    窗口函数在 `DISTINCT` 之前计算, 此时改为单独查询总数
+    """
+
+    stmt = page_statement(stmt, pagination)
+    if stmt._distinct:  # noqa: SLF001
+        rows = (yield stmt).all()
+        count = (yield count_statement(stmt)).scalar_one()
+        return Counted(
+            count=count,
+            results=get_results(rows, scalars=scalars),
+            has_next=_offset(pagination) + len(rows) < count,
+            strategy="exact",
+        )
+
+    count_column = sa.func.count().over().label(_COUNT_LABEL)
+    rows = (yield stmt.add_columns(count_column)).all()
+
+    if rows:
+        count = rows[0][-1]
+    elif pagination.page_no > 1:
+        # 超出最后一页时没有结果, 只能单独查询总数
+        count = (yield count_statement(stmt)).scalar_one()
+    else:
+        count = 0
+
+    return Counted(
+        count=count,
+        results=get_results(rows, scalars=scalars),
+        has_next=_offset(pagination) + len(rows) < count,
+        strategy="exact",
+    )
+
+
+def _lookahead_query(
+    stmt: sa.Select,
+    pagination: PageParamsModel,
+    *,
+    scalars: bool,
+) -> Generator[sa.Executable, sa.Result, tuple[list, bool]]:
+    """多查询一行, 判断是否还有下一页"""
+
+    page_size = pagination.page_size
+    stmt = stmt.limit(page_size + 1).offset(_offset(pagination))
+    rows = (yield stmt).all()
+    has_next = len(rows) > page_size
+    return get_results(rows[:page_size], scalars=scalars), has_next
+
+
+class Explain(sa.Executable, sa.ClauseElement):
+    """`EXPLAIN (FORMAT JSON) <stmt>`, 参数仍然以绑定参数传递"""
+
+    inherit_cache = True
+    _traverse_internals: ClassVar = [
+        ("stmt", InternalTraversal.dp_clauseelement)
+    ]
+
+    def __init__(self, stmt: sa.Select) -> None:
+        self.stmt = stmt
+
+
+@compiles(Explain)
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.stmt, **kw)
+
+
+class CountStrategy(ABC):
+    """分页总数的计算方式"""
+
+    @abstractmethod
+    def query(
+        self,
+        stmt: sa.Select,
+        pagination: PageParamsModel,
+        *,
+        scalars: bool,
+        dialect: Dialect,
+    ) -> CountQuery:
+        """查询当前页和总数
+
+        :param scalars: 结果是否为 ORM 实体, 否则为映射
+        """
+
+
+class ExactCount(CountStrategy):
+    """精确的总数, 与当前页在同一条语句中查询"""
+
+    def query(self, stmt, pagination, *, scalars, dialect):  # noqa: ARG002
+        return _window_query(stmt, pagination, scalars=scalars)
+
+
+class CachedCount(CountStrategy):
+    """缓存精确的总数
+
+    以编译后的语句和参数作为键, 命中时只查询当前页 (多查询一行判断
+    是否还有下一页), 总数可能是过期的
+
+    :param ttl: 过期时间 (秒), 为 None 时永不过期
+    :param maxsize: 最大缓存数量
+    """
+
+    def __init__(self, *, ttl: float | None = 60, maxsize: int = 1024):
+        self.cache = TTLCache[Hashable, int](maxsize=maxsize, ttl=ttl)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    @staticmethod
+    def _get_key(stmt: sa.Select, dialect: Dialect) -> Hashable | None:
+        compiled = stmt.order_by(None).compile(dialect=dialect)
+        key = (str(compiled), tuple(compiled.params.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def query(self, stmt, pagination, *, scalars, dialect):
+        key = self._get_key(stmt, dialect)
+        count = MISSING if key is None else self.cache.get(key)
+
+        if count is MISSING:
+            counted = yield from _window_query(
+                stmt, pagination, scalars=scalars
+            )
+            if key is not None:
+                self.cache.set(key, counted.count)
+            return counted
+
+        results, has_next = yield from _lookahead_query(
+            stmt, pagination, scalars=scalars
+        )
+        return Counted(
+            count=count,
+            results=results,
+            has_next=has_next,
+            strategy="cached",
+        )
+
+
+class EstimatedCount(CountStrategy):
+    """使用数据库对查询行数的估计作为总数
+
+    只查询当前页 (多查询一行判断是否还有下一页) 和一条估算语句;
+    已经是最后一页时, 总数是精确的
+
+    默认使用 PostgreSQL 的 `EXPLAIN`,
+    其他数据库可以重写 `estimate_statement` 和 `parse_estimate`
+    """
+
+    def estimate_statement(
+        self,
+        stmt: sa.Select,
+        dialect: Dialect,
+    ) -> sa.Executable:
+        """估算 `stmt` 行数的语句"""
+
+        if dialect.name != "postgresql":
+            msg = f"row estimate is not supported on {dialect.name}"
+            raise NotImplementedError(msg)
+
+        return Explain(stmt.order_by(None))
+
+    def parse_estimate(self, result: sa.Result) -> int:
+        """从估算语句的结果中获取行数"""
+
+        plan: Any = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def query(self, stmt, pagination, *, scalars, dialect):
+        results, has_next = yield from _lookahead_query(
+            stmt, pagination, scalars=scalars
+        )
+        seen = _offset(pagination) + len(results)
+
+        # 已经到最后一页了
+        if not has_next and (results or pagination.page_no == 1):
+            return Counted(
+                count=seen,
+                results=results,
+                has_next=False,
+                strategy="exact",
+            )
+
+        estimate = self.parse_estimate(
+            (yield self.estimate_statement(stmt, dialect))
+        )
+        return Counted(
+            count=max(estimate, seen + has_next),
+            results=results,
+            has_next=has_next,
+            strategy="estimated",
+        )
+
+
+class NoCount(CountStrategy):
+    """不计算总数, 只判断是否还有下一页"""
+
+    def query(self, stmt, pagination, *, scalars, dialect):  # noqa: ARG002
+        results, has_next = yield from _lookahead_query(
+            stmt, pagination, scalars=scalars
+        )
+        return Counted(
+            count=None,
+            results=results,
+            has_next=has_next,
+            strategy="none",
+        )
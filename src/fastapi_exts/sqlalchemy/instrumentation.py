@@ -0,0 +1,236 @@
+import threading
+from time import perf_counter
+from typing import Any, NamedTuple
+from weakref import WeakKeyDictionary
+
+import sqlalchemy as sa
+from sqlalchemy.ext import asyncio as asa
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# 保存在连接的 `info` 中
+_CHECKOUT_AT = "fastapi_exts.checkout_at"
+_WAIT = "fastapi_exts.wait"
+_TIMING = "fastapi_exts.timing"
+
+# 保存在 ASGI scope 中
+SERVER_TIMING = "fastapi_exts.server_timing"
+
+
+class PoolStats(NamedTuple):
+    checkouts: int
+    timeouts: int
+    wait_total: float
+    wait_max: float
+    hold_total: float
+    hold_max: float
+    size: int | None
+    checked_out: int | None
+    overflow: int | None
+
+
+class RequestTiming:
+    """一个请求中获取连接的等待时间和占用连接的时间 (秒)"""
+
+    __slots__ = ("checkouts", "hold", "name", "wait")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.checkouts = 0
+        self.wait = 0.0
+        self.hold = 0.0
+
+    def attach(self, info: dict) -> None:
+        """将刚取出的连接计入该请求, 连接归还时累加占用时间"""
+
+        if info.get(_TIMING) is self:
+            return
+        info[_TIMING] = self
+        self.checkouts += 1
+        self.wait += info.pop(_WAIT, 0.0)
+
+    def server_timing(self) -> str:
+        return (
+            f"{self.name}-wait;dur={self.wait * 1e3:.2f}, "
+            f"{self.name}-hold;dur={self.hold * 1e3:.2f}"
+        )
+
+    def register(self, connection: HTTPConnection) -> None:
+        """添加到 `ServerTimingMiddleware` 输出的响应头中"""
+
+        timings = connection.scope.get(SERVER_TIMING)
+        if timings is not None:
+            timings.append(self)
+
+
+class PoolInstrument:
+    """记录连接池的取出等待时间, 连接占用时间和超时次数
+
+    包装 `pool.connect` 计时, 在 `checkin` 事件中计算占用时间,
+    每次取出连接只增加两次计时和两次加锁; 使用 `instrument_pool`
+    获取引擎对应的实例
+
+    `dispose` 之后, 从新连接池归还第一个连接时才开始计时
+    """
+
+    def __init__(self, engine: sa.Engine) -> None:
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.reset()
+
+        self._pool = engine.pool
+        self._wrap_pool(engine.pool)
+        # 只监听连接池的事件, 引擎的事件会让每次执行都检查监听器
+        sa.event.listen(engine, "checkin", self._on_checkin)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.hold_total = 0.0
+            self.hold_max = 0.0
+
+    def _wrap_pool(self, pool: sa.Pool) -> None:
+        connect = pool.connect
+
+        def instrumented_connect():
+            start = perf_counter()
+            try:
+                connection = connect()
+            except sa.exc.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+
+            now = perf_counter()
+            wait = now - start
+            info = connection.info
+            info[_CHECKOUT_AT] = now
+            info[_WAIT] = wait
+
+            with self._lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+            return connection
+
+        pool.connect = instrumented_connect  # type: ignore[method-assign]
+
+    def _on_checkin(self, _dbapi_connection: Any, record: Any) -> None:
+        if self.engine.pool is not self._pool:
+            # `dispose` 重新创建了连接池, 之后取出的连接才会计时
+            with self._lock:
+                if self.engine.pool is not self._pool:
+                    self._pool = self.engine.pool
+                    self._wrap_pool(self._pool)
+
+        if record is None:
+            return
+
+        info = record.info
+        checkout_at = info.pop(_CHECKOUT_AT, None)
+        if checkout_at is None:
+            return
+
+        hold = perf_counter() - checkout_at
+        info.pop(_WAIT, None)
+        timing: RequestTiming | None = info.pop(_TIMING, None)
+        if timing is not None:
+            timing.hold += hold
+
+        with self._lock:
+            self.hold_total += hold
+            self.hold_max = max(self.hold_max, hold)
+
+    def stats(self) -> PoolStats:
+        pool = self.engine.pool
+        return PoolStats(
+            checkouts=self.checkouts,
+            timeouts=self.timeouts,
+            wait_total=self.wait_total,
+            wait_max=self.wait_max,
+            hold_total=self.hold_total,
+            hold_max=self.hold_max,
+            size=_pool_gauge(pool, "size"),
+            checked_out=_pool_gauge(pool, "checkedout"),
+            overflow=_pool_gauge(pool, "overflow"),
+        )
+
+
+def _pool_gauge(pool: sa.Pool, name: str) -> int | None:
+    # 只有 `QueuePool` 提供这些数据
+    method = getattr(pool, name, None)
+    return None if method is None else method()
+
+
+_instruments: WeakKeyDictionary[sa.Engine, PoolInstrument] = (
+    WeakKeyDictionary()
+)
+_instruments_lock = threading.Lock()
+
+
+def instrument_pool(engine: sa.Engine | asa.AsyncEngine) -> PoolInstrument:
+    """获取引擎连接池的 `PoolInstrument`, 不存在时创建"""
+
+    if isinstance(engine, asa.AsyncEngine):
+        engine = engine.sync_engine
+
+    with _instruments_lock:
+        instrument = _instruments.get(engine)
+        if instrument is None:
+            instrument = PoolInstrument(engine)
+            _instruments[engine] = instrument
+        return instrument
+
+
+def _on_session_begin(session: Session, _transaction, connection) -> None:
+    timing: RequestTiming | None = session.info.get(_TIMING)
+    if timing is not None:
+        timing.attach(connection.info)
+
+
+def track_session(session: Session, timing: RequestTiming) -> None:
+    """将会话取出的连接计入 `timing`
+
+    只监听该会话实例的事件, 不影响进程中的其他会话
+    """
+
+    session.info[_TIMING] = timing
+    if not sa.event.contains(session, "after_begin", _on_session_begin):
+        sa.event.listen(session, "after_begin", _on_session_begin)
+
+
+class ServerTimingMiddleware:
+    """将请求中记录的 `RequestTiming` 添加到 `Server-Timing` 响应头
+
+    ```python
+    app.add_middleware(ServerTimingMiddleware)
+    ```
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list[RequestTiming] = []
+        scope[SERVER_TIMING] = timings
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and timings:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    ", ".join(i.server_timing() for i in timings),
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
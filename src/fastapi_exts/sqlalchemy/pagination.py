@@ -1,16 +1,58 @@
-from typing import overload
+import asyncio
+from collections.abc import (
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterable,
+    Mapping,
+)
+from functools import cache
+from typing import Any, Generic, TypeVar, overload
 
+import sqlalchemy as sa
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy import MappingResult, ScalarResult
+from sqlalchemy.engine import Dialect
+from sqlalchemy.ext import asyncio as asa
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.sql import ColumnElement, operators
 
 from fastapi_exts.pagination import (
+    APICursorPage,
+    APICursorParamsModel,
     APIPage,
     APIPageParamsModel,
+    APIStrategyPage,
     BaseModelT,
+    CursorCodec,
+    CursorPage,
+    CursorParamsModel,
+    InvalidCursorError,
     Page,
     PageParamsModel,
+    StrategyPage,
+    api_cursor_page,
+    api_strategy_page,
+    cursor_page,
+    strategy_page,
 )
 from fastapi_exts.pagination import api_page as _api_page
 from fastapi_exts.pagination import page as _page
+from fastapi_exts.sqlalchemy.count import (
+    CountQuery,
+    CountStrategy,
+    Counted,
+    ExactCount,
+    count_statement,
+    get_results,
+    page_statement,
+)
+from fastapi_exts.sqlalchemy.mixins import IDBase
+
+
+ModelT = TypeVar("ModelT", bound=IDBase)
+SelectT = TypeVar("SelectT", bound=sa.Select)
 
 
 @overload
@@ -32,7 +74,7 @@ def page(
 
 
 def page(*args, **kwds):
-    return _page(*args, *kwds)
+    return _page(*args, **kwds)
 
 
 @overload
@@ -54,4 +96,504 @@ def api_page(
 
 
 def api_page(*args, **kwds):
-    return _api_page(*args, *kwds)
+    return _api_page(*args, **kwds)
+
+
+SyncExecutor = Session | sa.Connection
+AsyncExecutor = asa.AsyncSession | asa.AsyncConnection | asa.AsyncEngine
+
+
+_exact_count = ExactCount()
+
+
+def _is_entity_select(stmt: sa.Select) -> bool:
+    descriptions = stmt.column_descriptions
+    return (
+        len(descriptions) == 1
+        and descriptions[0]["entity"] is not None
+        and descriptions[0]["expr"] is descriptions[0]["entity"]
+    )
+
+
+def _get_dialect(executor: SyncExecutor | AsyncExecutor) -> Dialect:
+    if isinstance(executor, Session | asa.AsyncSession):
+        return executor.get_bind().dialect
+    return executor.dialect
+
+
+def _run_query(query: CountQuery, execute: Callable[..., sa.Result]):
+    try:
+        stmt = next(query)
+        while True:
+            stmt = query.send(execute(stmt))
+    except StopIteration as e:
+        return e.value
+
+
+async def _arun_query(
+    query: CountQuery,
+    execute: Callable[..., Awaitable[sa.Result]],
+):
+    try:
+        stmt = next(query)
+        while True:
+            stmt = query.send(await execute(stmt))
+    except StopIteration as e:
+        return e.value
+
+
+async def _fetch_concurrently(
+    engine: asa.AsyncEngine,
+    stmt: sa.Select,
+    pagination: PageParamsModel,
+) -> Counted:
+    """在两个连接上并发查询当前页和总数"""
+
+    async def execute(stmt: sa.Select) -> sa.Result:
+        async with engine.connect() as connection:
+            return await connection.execute(stmt)
+
+    rows, count = await asyncio.gather(
+        execute(page_statement(stmt, pagination)),
+        execute(count_statement(stmt)),
+    )
+    results = get_results(rows, scalars=False)
+    count = count.scalar_one()
+    offset = (pagination.page_no - 1) * pagination.page_size
+    return Counted(
+        count=count,
+        results=results,
+        has_next=offset + len(results) < count,
+        strategy="exact",
+    )
+
+
+def _fetch(
+    executor: SyncExecutor,
+    stmt: sa.Select,
+    pagination: PageParamsModel,
+    strategy: CountStrategy,
+) -> Counted:
+    query = strategy.query(
+        stmt,
+        pagination,
+        scalars=isinstance(executor, Session) and _is_entity_select(stmt),
+        dialect=_get_dialect(executor),
+    )
+    return _run_query(query, executor.execute)
+
+
+async def _afetch(
+    executor: AsyncExecutor,
+    stmt: sa.Select,
+    pagination: PageParamsModel,
+    strategy: CountStrategy,
+    *,
+    concurrent: bool = False,
+) -> Counted:
+    if isinstance(executor, asa.AsyncEngine):
+        if concurrent:
+            return await _fetch_concurrently(executor, stmt, pagination)
+        async with executor.connect() as connection:
+            return await _afetch(connection, stmt, pagination, strategy)
+
+    query = strategy.query(
+        stmt,
+        pagination,
+        scalars=isinstance(executor, asa.AsyncSession)
+        and _is_entity_select(stmt),
+        dialect=_get_dialect(executor),
+    )
+    return await _arun_query(query, executor.execute)
+
+
+@overload
+def fetch_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor,
+    *,
+    concurrent: bool = False,
+) -> Page[BaseModelT]: ...
+@overload
+def fetch_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: AsyncExecutor,
+    *,
+    concurrent: bool = False,
+) -> Coroutine[Any, Any, Page[BaseModelT]]: ...
+
+
+def fetch_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor | AsyncExecutor,
+    *,
+    concurrent: bool = False,
+):
+    """查询并构建分页, 总数与当前页只需要一次数据库往返
+
+    :param stmt: 查询语句, 不需要添加 `limit` 和 `offset`
+    :param executor: `create_session_dependency` 或
+        `create_engine_dependency` 提供的会话或连接, 也可以是异步引擎;
+        异步的执行器返回协程
+    :param concurrent: 执行器是异步引擎时, 使用两个连接并发查询当前页和
+        `COUNT(*)`, 而不是使用窗口函数; 适用于窗口函数需要物化大量行,
+        而单独计数可以使用索引的情况
+    """
+
+    if isinstance(executor, AsyncExecutor):
+
+        async def fetch():
+            counted = await _afetch(
+                executor,
+                stmt,
+                pagination,
+                _exact_count,
+                concurrent=concurrent,
+            )
+            return _page(
+                model_class, pagination, counted.count, counted.results
+            )
+
+        return fetch()
+
+    counted = _fetch(executor, stmt, pagination, _exact_count)
+    return _page(model_class, pagination, counted.count, counted.results)
+
+
+@overload
+def fetch_api_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor,
+    *,
+    concurrent: bool = False,
+) -> APIPage[BaseModelT]: ...
+@overload
+def fetch_api_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: AsyncExecutor,
+    *,
+    concurrent: bool = False,
+) -> Coroutine[Any, Any, APIPage[BaseModelT]]: ...
+
+
+def fetch_api_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor | AsyncExecutor,
+    *,
+    concurrent: bool = False,
+):
+    if isinstance(executor, AsyncExecutor):
+
+        async def fetch():
+            counted = await _afetch(
+                executor,
+                stmt,
+                pagination,
+                _exact_count,
+                concurrent=concurrent,
+            )
+            return _api_page(
+                model_class, pagination, counted.count, counted.results
+            )
+
+        return fetch()
+
+    counted = _fetch(executor, stmt, pagination, _exact_count)
+    return _api_page(model_class, pagination, counted.count, counted.results)
+
+
+@overload
+def fetch_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+) -> StrategyPage[BaseModelT]: ...
+@overload
+def fetch_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: AsyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+) -> Coroutine[Any, Any, StrategyPage[BaseModelT]]: ...
+
+
+def fetch_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor | AsyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+):
+    """使用指定的方式计算总数, 分页中会标明总数的来源
+
+    :param strategy: `ExactCount`, `CachedCount`, `EstimatedCount`
+        或者 `NoCount`, 缓存的策略需要在多个请求间共用同一个实例
+    """
+
+    def build(counted: Counted):
+        return strategy_page(
+            model_class,
+            pagination,
+            counted.count,
+            counted.results,
+            count_strategy=counted.strategy,
+            has_next=counted.has_next,
+        )
+
+    if isinstance(executor, AsyncExecutor):
+
+        async def fetch():
+            return build(await _afetch(executor, stmt, pagination, strategy))
+
+        return fetch()
+
+    return build(_fetch(executor, stmt, pagination, strategy))
+
+
+@overload
+def fetch_api_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+) -> APIStrategyPage[BaseModelT]: ...
+@overload
+def fetch_api_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: AsyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+) -> Coroutine[Any, Any, APIStrategyPage[BaseModelT]]: ...
+
+
+def fetch_api_strategy_page(
+    model_class: type[BaseModelT],
+    pagination: PageParamsModel | APIPageParamsModel,
+    stmt: sa.Select,
+    executor: SyncExecutor | AsyncExecutor,
+    *,
+    strategy: CountStrategy = _exact_count,
+):
+    def build(counted: Counted):
+        return api_strategy_page(
+            model_class,
+            pagination,
+            counted.count,
+            counted.results,
+            count_strategy=counted.strategy,
+            has_next=counted.has_next,
+        )
+
+    if isinstance(executor, AsyncExecutor):
+
+        async def fetch():
+            return build(await _afetch(executor, stmt, pagination, strategy))
+
+        return fetch()
+
+    return build(_fetch(executor, stmt, pagination, strategy))
+
+
+@cache
+def _get_adapter(python_type: type) -> TypeAdapter:
+    return TypeAdapter(python_type)
+
+
+class _KeysetColumn:
+    """排序列及其方向, 以及从游标的值还原为列的 Python 类型的适配器"""
+
+    __slots__ = ("adapter", "column", "desc", "key")
+
+    def __init__(self, model: type[IDBase], order_by: Any) -> None:
+        desc = False
+        if isinstance(order_by, sa.UnaryExpression) and order_by.modifier in {
+            operators.asc_op,
+            operators.desc_op,
+        }:
+            desc = order_by.modifier is operators.desc_op
+            order_by = order_by.element
+
+        if isinstance(order_by, InstrumentedAttribute):
+            key = order_by.key
+            column = order_by.expression
+        else:
+            column = order_by
+            try:
+                key = sa.inspect(model).get_property_by_column(column).key
+            except UnmappedColumnError:
+                key = column.key
+
+        try:
+            adapter = _get_adapter(column.type.python_type)
+        except NotImplementedError:
+            adapter = None
+
+        self.column: ColumnElement = column
+        self.desc = desc
+        self.key: str = key
+        self.adapter = adapter
+
+    def coerce(self, value: Any):
+        if value is None or self.adapter is None:
+            return value
+        return self.adapter.validate_python(value)
+
+
+class Keyset(Generic[ModelT]):
+    """`IDBase` 模型的键集 (游标) 分页
+
+    按 `order_by` 排序, 并以主键 `id` 作为最后的排序列保证顺序唯一
+    (方向与前一个排序列相同);
+    每一页都从上一页最后一行的值开始查询, 不使用 `OFFSET`,
+    有相应的索引时, 查询的耗时与翻到第几页无关
+
+    ```python
+    codec = CursorCodec(secret)
+    keyset = Keyset(User, User.created_at.desc(), codec=codec)
+
+
+    @router.get("/users")
+    def users(session: Session, pagination: CursorParams):
+        stmt = keyset.apply(sa.select(User), pagination)
+        return keyset.page(UserModel, pagination, session.scalars(stmt))
+    ```
+
+    :param order_by: 排序列, 可以使用 `.asc()` 和 `.desc()` 指定方向,
+        排序列的值不能为 NULL
+    :param row_values: 所有排序列的方向相同时,
+        使用行值比较 `(a, b) > (:a, :b)` 代替展开的 OR 条件
+    """
+
+    def __init__(
+        self,
+        model: type[ModelT],
+        *order_by: Any,
+        codec: CursorCodec,
+        row_values: bool = True,
+    ) -> None:
+        columns = [_KeysetColumn(model, i) for i in order_by]
+        id_column = _KeysetColumn(model, model.id)
+        if all(i.key != id_column.key for i in columns):
+            # 与最后的排序列方向相同
+            id_column.desc = bool(columns) and columns[-1].desc
+            columns.append(id_column)
+
+        self.model = model
+        self.codec = codec
+        self.columns = tuple(columns)
+        self.row_values = row_values and len({i.desc for i in columns}) == 1
+        self.order_by = tuple(
+            i.column.desc() if i.desc else i.column.asc() for i in columns
+        )
+
+    def decode(self, cursor: str) -> list:
+        """解码游标, 并将值转为列的 Python 类型"""
+
+        values = self.codec.decode(cursor)
+        if len(values) != len(self.columns):
+            raise InvalidCursorError
+
+        try:
+            return [
+                column.coerce(value)
+                for column, value in zip(self.columns, values, strict=True)
+            ]
+        except ValidationError as e:
+            raise InvalidCursorError from e
+
+    def where(self, values: list) -> ColumnElement[bool]:
+        """排在 `values` 之后的行"""
+
+        if self.row_values:
+            left = sa.tuple_(*(i.column for i in self.columns))
+            right = sa.tuple_(
+                *(
+                    sa.literal(value, i.column.type)
+                    for i, value in zip(self.columns, values, strict=True)
+                )
+            )
+            return left < right if self.columns[0].desc else left > right
+
+        # (a > :a) OR (a = :a AND b > :b) OR ...
+        clauses = []
+        for index, column in enumerate(self.columns):
+            value = values[index]
+            clauses.append(
+                sa.and_(
+                    *(
+                        i.column == v
+                        for i, v in zip(
+                            self.columns[:index], values[:index], strict=True
+                        )
+                    ),
+                    column.column < value
+                    if column.desc
+                    else column.column > value,
+                )
+            )
+        return sa.or_(*clauses)
+
+    def apply(self, stmt: SelectT, pagination: CursorParamsModel) -> SelectT:
+        """添加排序, 游标条件, 并且多查询一行用于判断是否有下一页"""
+
+        stmt = stmt.order_by(*self.order_by).limit(pagination.page_size + 1)
+        if pagination.cursor is not None:
+            stmt = stmt.where(self.where(self.decode(pagination.cursor)))
+        return stmt
+
+    def values(self, row: Any) -> list:
+        """一行结果的排序列的值"""
+
+        if isinstance(row, Mapping):
+            return [row[i.key] for i in self.columns]
+        return [getattr(row, i.key) for i in self.columns]
+
+    def page(
+        self,
+        model_class: type[BaseModelT],
+        pagination: CursorParamsModel,
+        results: Iterable,
+    ) -> CursorPage[BaseModelT]:
+        return cursor_page(
+            model_class,
+            pagination,
+            results,
+            codec=self.codec,
+            key=self.values,
+        )
+
+    def api_page(
+        self,
+        model_class: type[BaseModelT],
+        pagination: CursorParamsModel | APICursorParamsModel,
+        results: Iterable,
+    ) -> APICursorPage[BaseModelT]:
+        return api_cursor_page(
+            model_class,
+            pagination,
+            results,
+            codec=self.codec,
+            key=self.values,
+        )
@@ -0,0 +1,307 @@
+import threading
+from collections.abc import (
+    AsyncGenerator,
+    Callable,
+    Collection,
+    Generator,
+    Sequence,
+)
+from itertools import count
+from time import monotonic
+from typing import Any, Literal, TypeVar, overload
+
+import sqlalchemy as sa
+from fastapi import Request
+from sqlalchemy.ext import asyncio as asa
+from sqlalchemy.orm import Session, sessionmaker
+
+
+ReplicaSelection = Literal["round_robin", "least_in_flight"]
+
+Replica = sa.Engine | asa.AsyncEngine | sessionmaker | asa.async_sessionmaker
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_T = TypeVar("_T", bound=Callable)
+
+
+def _get_engine(replica: Replica) -> sa.Engine:
+    if isinstance(replica, sessionmaker | asa.async_sessionmaker):
+        bind = replica.kw.get("bind")
+        if bind is None:
+            msg = "replica sessionmaker must be bound to an engine"
+            raise ValueError(msg)
+        replica = bind
+    if isinstance(replica, asa.AsyncEngine):
+        return replica.sync_engine
+    return replica
+
+
+class ReplicaSet:
+    """从库的集合, 负责选择从库和故障转移
+
+    开启 `probe` 时, 选出的从库会先建立一次连接, 失败时在 `cooldown`
+    秒内不再使用, 并尝试下一个从库; 每次选择都会多取出一次连接,
+    所以默认关闭, 从库的故障由查询抛出; 开启时从库的引擎建议同时开启
+    `pool_pre_ping`, 以便在连接池中的连接失效时也能发现
+
+    :param replicas: 从库的引擎或 sessionmaker
+    :param selection: `round_robin` 轮流选择,
+        `least_in_flight` 选择正在使用的会话最少的从库
+    :param cooldown: 从库连接失败后, 多久之后再次尝试 (秒)
+    :param probe: 选择从库时是否先建立一次连接, 用于故障转移
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[Replica],
+        *,
+        selection: ReplicaSelection = "round_robin",
+        cooldown: float = 30,
+        probe: bool = False,
+    ) -> None:
+        self.engines = [_get_engine(i) for i in replicas]
+        self.selection = selection
+        self.cooldown = cooldown
+        self.probe = probe
+
+        self._lock = threading.Lock()
+        self._counter = count()
+        self._in_flight = [0] * len(self.engines)
+        self._down_until = [0.0] * len(self.engines)
+
+    @property
+    def in_flight(self) -> list[int]:
+        """每个从库正在使用的会话数量"""
+        return list(self._in_flight)
+
+    def _candidates(self) -> list[int]:
+        size = len(self.engines)
+        now = monotonic()
+
+        with self._lock:
+            start = next(self._counter)
+            indexes = [
+                i % size
+                for i in range(start, start + size)
+                if self._down_until[i % size] <= now
+            ]
+            if self.selection == "least_in_flight":
+                # 正在使用的数量相同时, 按轮流的顺序
+                indexes.sort(key=self._in_flight.__getitem__)
+        return indexes
+
+    def _is_available(self, index: int) -> bool:
+        if not self.probe:
+            return True
+        try:
+            self.engines[index].connect().close()
+        except sa.exc.DBAPIError:
+            self.mark_down(index)
+            return False
+        return True
+
+    def acquire(self) -> int | None:
+        """选择一个可用的从库, 返回其索引, 没有可用的从库时返回 None
+
+        使用完毕后需要调用 `release`
+        """
+
+        for index in self._candidates():
+            if self._is_available(index):
+                with self._lock:
+                    self._in_flight[index] += 1
+                return index
+        return None
+
+    def release(self, index: int) -> None:
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    def mark_down(self, index: int) -> None:
+        """在 `cooldown` 秒内不再使用该从库"""
+
+        with self._lock:
+            self._down_until[index] = monotonic() + self.cooldown
+
+
+def _is_write(clause: Any) -> bool:
+    if clause is None:
+        return False
+    if not isinstance(clause, sa.SelectBase):
+        return True
+    # `SELECT ... FOR UPDATE` 需要在主库上加锁
+    return getattr(clause, "_for_update_arg", None) is not None
+
+
+class RoutingSession(Session):
+    """将只读会话的查询路由到从库的会话
+
+    `read_only` 为 True 时, 查询使用 `ReplicaSet` 选出的从库,
+    同一个会话始终使用同一个从库; 发生写入 (flush, `SELECT ... FOR
+    UPDATE` 或执行 SELECT 以外的语句, 包括 `text()` 等无法判断是否
+    写入的语句) 之后, 之后的查询都使用主库, 以便读到刚写入的数据;
+    没有可用的从库时使用主库
+
+    `bind` 为主库
+
+    ```python
+    Session = sessionmaker(primary, class_=RoutingSession)
+    AsyncSession = async_sessionmaker(
+        primary, sync_session_class=RoutingSession
+    )
+    ```
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        replicas: ReplicaSet | None = None,
+        read_only: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.read_only = read_only
+
+        self._writing = False
+        self._replica: int | None = None
+        self._replica_acquired = False
+
+    def use_primary(self) -> None:
+        """之后的查询都使用主库"""
+
+        self._writing = True
+
+    def _get_replica(self) -> sa.Engine | None:
+        if self.replicas is None:
+            return None
+
+        if not self._replica_acquired:
+            self._replica = self.replicas.acquire()
+            self._replica_acquired = True
+
+        if self._replica is None:
+            return None
+        return self.replicas.engines[self._replica]
+
+    def get_bind(
+        self,
+        mapper: Any = None,
+        *,
+        clause: Any = None,
+        **kwargs: Any,
+    ) -> sa.Engine | sa.Connection:
+        if self.read_only and not self._writing:
+            if self._flushing or _is_write(clause):
+                self._writing = True
+            else:
+                replica = self._get_replica()
+                if replica is not None:
+                    return replica
+
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def close(self) -> None:
+        super().close()
+
+        if self._replica is not None and self.replicas is not None:
+            self.replicas.release(self._replica)
+        self._writing = False
+        self._replica = None
+        self._replica_acquired = False
+
+
+def read_only(endpoint: _T) -> _T:
+    """标记端点只读, 会话的查询使用从库"""
+
+    endpoint.__read_only__ = True  # type: ignore[attr-defined]
+    return endpoint
+
+
+def read_write(endpoint: _T) -> _T:
+    """标记端点会写入, 会话的查询使用主库"""
+
+    endpoint.__read_only__ = False  # type: ignore[attr-defined]
+    return endpoint
+
+
+def is_read_only(request: Request, read_methods: Collection[str]) -> bool:
+    """端点的 `read_only`/`read_write` 标记优先, 否则按请求方法判断"""
+
+    marker = getattr(request.scope.get("endpoint"), "__read_only__", None)
+    if marker is not None:
+        return marker
+    return request.method in read_methods
+
+
+@overload
+def create_routing_session_dependency(
+    sessionmaker: sessionmaker,
+    replicas: ReplicaSet | Sequence[Replica],
+    *,
+    selection: ReplicaSelection = "round_robin",
+    read_methods: Collection[str] = READ_METHODS,
+) -> Callable[[Request], Generator[RoutingSession, None]]: ...
+@overload
+def create_routing_session_dependency(
+    sessionmaker: asa.async_sessionmaker,
+    replicas: ReplicaSet | Sequence[Replica],
+    *,
+    selection: ReplicaSelection = "round_robin",
+    read_methods: Collection[str] = READ_METHODS,
+) -> Callable[[Request], AsyncGenerator[asa.AsyncSession, None]]: ...
+
+
+def create_routing_session_dependency(
+    sessionmaker: sessionmaker | asa.async_sessionmaker,
+    replicas: ReplicaSet | Sequence[Replica],
+    *,
+    selection: ReplicaSelection = "round_robin",
+    read_methods: Collection[str] = READ_METHODS,
+):
+    """读写分离的会话依赖
+
+    只读的请求 (`read_methods` 中的请求方法, 或使用 `read_only`
+    标记的端点) 使用从库, 其他请求使用主库, 见 `RoutingSession`
+
+    :param sessionmaker: 主库的 sessionmaker, 会话的类型需要是
+        `RoutingSession`
+    :param replicas: 从库, 传入 `ReplicaSet` 时忽略 `selection`
+    """
+
+    if isinstance(sessionmaker, asa.async_sessionmaker):
+        session_class = (
+            sessionmaker.kw.get("sync_session_class")
+            or sessionmaker.class_.sync_session_class
+        )
+    else:
+        session_class = sessionmaker.class_
+    if not issubclass(session_class, RoutingSession):
+        msg = f"session class must be RoutingSession, got {session_class!r}"
+        raise TypeError(msg)
+
+    if not isinstance(replicas, ReplicaSet):
+        replicas = ReplicaSet(replicas, selection=selection)
+
+    if isinstance(sessionmaker, asa.async_sessionmaker):
+
+        async def get_async_session(
+            request: Request,
+        ) -> AsyncGenerator[asa.AsyncSession, None]:
+            async with sessionmaker(
+                replicas=replicas,
+                read_only=is_read_only(request, read_methods),
+            ) as session:
+                yield session
+
+        return get_async_session
+
+    def get_session(request: Request) -> Generator[RoutingSession, None]:
+        with sessionmaker(
+            replicas=replicas,
+            read_only=is_read_only(request, read_methods),
+        ) as session:
+            yield session
+
+    return get_session
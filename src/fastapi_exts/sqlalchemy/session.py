@@ -2,23 +2,46 @@ from collections.abc import AsyncGenerator, Callable, Generator
 from typing import overload
 
 import sqlalchemy as sa
+from fastapi import Request
 from sqlalchemy.ext import asyncio as asa
 from sqlalchemy.orm import Session, sessionmaker
 
+from .instrumentation import RequestTiming, instrument_pool, track_session
+
 
 @overload
 def create_engine_dependency(
     engine: sa.Engine,
-) -> Callable[[], Generator[sa.Connection, None]]: ...
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
+) -> Callable[..., Generator[sa.Connection, None]]: ...
 @overload
 def create_engine_dependency(
     engine: asa.AsyncEngine,
-) -> Callable[[], AsyncGenerator[asa.AsyncConnection, None]]: ...
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
+) -> Callable[..., AsyncGenerator[asa.AsyncConnection, None]]: ...
 
 
 def create_engine_dependency(
     engine: sa.Engine | asa.AsyncEngine,
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
 ):
+    """连接依赖
+
+    :param instrument: 记录连接池的等待和占用时间, 通过
+        `instrument_pool(engine).stats()` 获取; 使用
+        `ServerTimingMiddleware` 时, 请求的数据会以 `timing_name`
+        为前缀添加到 `Server-Timing` 响应头
+    """
+
+    if instrument:
+        return _create_instrumented_engine_dependency(engine, timing_name)
+
     if isinstance(engine, asa.AsyncEngine):
 
         async def get_async_connection() -> AsyncGenerator[
@@ -36,19 +59,68 @@ def create_engine_dependency(
     return get_connection
 
 
+def _create_instrumented_engine_dependency(
+    engine: sa.Engine | asa.AsyncEngine,
+    timing_name: str,
+):
+    instrument_pool(engine)
+
+    if isinstance(engine, asa.AsyncEngine):
+
+        async def get_async_connection(
+            request: Request,
+        ) -> AsyncGenerator[asa.AsyncConnection, None]:
+            timing = RequestTiming(timing_name)
+            timing.register(request)
+            async with engine.connect() as connection:
+                timing.attach(connection.sync_connection.info)
+                yield connection
+
+        return get_async_connection
+
+    def get_connection(request: Request) -> Generator[sa.Connection, None]:
+        timing = RequestTiming(timing_name)
+        timing.register(request)
+        with engine.connect() as connection:
+            timing.attach(connection.info)
+            yield connection
+
+    return get_connection
+
+
 @overload
 def create_session_dependency(
     sessionmaker: sessionmaker,
-) -> Callable[[], Generator[Session, None]]: ...
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
+) -> Callable[..., Generator[Session, None]]: ...
 @overload
 def create_session_dependency(
     sessionmaker: asa.async_sessionmaker,
-) -> Callable[[], AsyncGenerator[asa.AsyncSession, None]]: ...
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
+) -> Callable[..., AsyncGenerator[asa.AsyncSession, None]]: ...
 
 
 def create_session_dependency(
     sessionmaker: sessionmaker | asa.async_sessionmaker,
+    *,
+    instrument: bool = False,
+    timing_name: str = "db",
 ):
+    """会话依赖
+
+    :param instrument: 记录 `sessionmaker` 绑定的引擎连接池的等待和占用
+        时间, 见 `create_engine_dependency`
+    """
+
+    if instrument:
+        return _create_instrumented_session_dependency(
+            sessionmaker, timing_name
+        )
+
     if isinstance(sessionmaker, asa.async_sessionmaker):
 
         async def get_async_session() -> AsyncGenerator[
@@ -64,3 +136,36 @@ def create_session_dependency(
             yield session
 
     return get_session
+
+
+def _create_instrumented_session_dependency(
+    sessionmaker: sessionmaker | asa.async_sessionmaker,
+    timing_name: str,
+):
+    engine = sessionmaker.kw.get("bind")
+    if engine is None:
+        msg = "sessionmaker must be bound to an engine to be instrumented"
+        raise ValueError(msg)
+    instrument_pool(engine)
+
+    if isinstance(sessionmaker, asa.async_sessionmaker):
+
+        async def get_async_session(
+            request: Request,
+        ) -> AsyncGenerator[asa.AsyncSession, None]:
+            timing = RequestTiming(timing_name)
+            timing.register(request)
+            async with sessionmaker() as session:
+                track_session(session.sync_session, timing)
+                yield session
+
+        return get_async_session
+
+    def get_session(request: Request) -> Generator[Session, None]:
+        timing = RequestTiming(timing_name)
+        timing.register(request)
+        with sessionmaker() as session:
+            track_session(session, timing)
+            yield session
+
+    return get_session
@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+from typing import Annotated, Any, ClassVar
+
+import pytest
+from fastapi import BackgroundTasks, Depends, FastAPI, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.testclient import TestClient
+from starlette.background import BackgroundTask
 
 from fastapi_exts.cbv import CBV
+from fastapi_exts.cbv._utils import iter_class_dependency
 from fastapi_exts.exceptions import NamedHTTPError
 from fastapi_exts.provider import Provider
 
@@ -64,3 +72,339 @@ def test_api_router():
 
     assert str(AError.status) in openapi["paths"][path2]["get"]["responses"]
     assert str(BError.status) in openapi["paths"][path2]["get"]["responses"]
+
+
+path3 = "/3"
+
+# 通过 exec 创建的类没有源码
+namespace = {
+    "Annotated": Annotated,
+    "Depends": Depends,
+    "cbv": cbv,
+    "path3": path3,
+    "provider": provider,
+}
+exec(  # noqa: S102
+    """
+class Base:
+    base_value: Annotated[int, Depends(lambda: 1)]
+    an_value = provider
+
+
+@cbv
+class Routes3(Base):
+    value: Annotated[int, Depends(lambda: 2)]
+
+    @cbv.get(path3)
+    def api(self):
+        return [self.base_value, self.value, self.an_value.value]
+""",
+    namespace,
+)
+
+
+def test_class_without_source():
+    names = [name for name, *_ in iter_class_dependency(namespace["Routes3"])]
+    assert names == ["value", "base_value", "an_value"]
+
+    res = TestClient(app).get(path3)
+    assert res.json() == [1, 2, value]
+
+
+def test_base_class_annotations():
+    class Base:
+        registry: ClassVar[dict[str, int]] = {}
+        # 实例属性的声明, 不是依赖
+        cache: dict[str, int]
+        base_value: Annotated[int, Depends(lambda: 1)]
+
+    class Routes(Base):
+        counter: ClassVar[int] = 0
+        value: Annotated[int, Depends(lambda: 2)]
+        query: int = Query(3)
+
+    names = [name for name, *_ in iter_class_dependency(Routes)]
+    assert names == ["value", "query", "base_value"]
+
+
+path4 = "/4"
+
+
+@cbv
+class SlotsRoutes:
+    __slots__ = ("total", "value")
+
+    value: Annotated[int, Depends(lambda: 2)]
+
+    def __post_init__(self):
+        self.total = self.value * 10
+
+    @cbv.get(path4)
+    async def api(self, an_value=provider):
+        return [self.value, self.total, an_value.value]
+
+    @cbv.get(f"{path4}/sync")
+    def sync_api(self):
+        return [self.value, self.total]
+
+
+def test_slots():
+    test_client = TestClient(app)
+
+    res = test_client.get(path4)
+    assert res.json() == [2, 20, value]
+
+    res = test_client.get(f"{path4}/sync")
+    assert res.json() == [2, 20]
+
+
+shared_path = "/shared"
+
+
+@cbv
+class SharedRoutes:
+    value: Annotated[int, Depends(lambda: 2)]
+
+    @cbv.get(shared_path)
+    async def api(self):
+        return self.value
+
+    @cbv.get(f"{shared_path}/total")
+    async def total_api(self):
+        return self.value * 10
+
+    @cbv.get(f"{shared_path}/sync")
+    def sync_api(self):
+        return self.value
+
+
+def test_shared_class_dependency():
+    calls = {
+        route.path: route.dependant.dependencies[0].call
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path.startswith(shared_path)
+    }
+
+    # 同一个类中调用方式相同的路由共用一个依赖
+    assert calls[shared_path].__name__ == "create_SharedRoutes"
+    assert calls[shared_path] is calls[f"{shared_path}/total"]
+    assert calls[shared_path] is not calls[f"{shared_path}/sync"]
+
+    res = TestClient(app).get(f"{shared_path}/total")
+    assert res.json() == 20  # noqa: PLR2004
+
+
+def test_singleton():
+    singleton_app = FastAPI()
+    singleton_cbv = CBV(singleton_app, lifetime="singleton")
+    created = []
+
+    app_settings = Provider(lambda: {"debug": True}, scope="app")
+
+    @singleton_cbv
+    class Routes:
+        settings = app_settings
+        prefix: Annotated[str, Depends(lambda: "item")]
+
+        def __post_init__(self):
+            created.append(self)
+
+        @singleton_cbv.get("/items/{item_id}")
+        async def item(self, item_id: int, an_value=provider):
+            return [
+                f"{self.prefix}-{item_id}",
+                self.settings.value["debug"],
+                an_value.value,
+            ]
+
+        @singleton_cbv.get("/sync")
+        def sync_item(self):
+            return id(self)
+
+    with TestClient(singleton_app) as client:
+        assert client.get("/items/1").json() == ["item-1", True, value]
+        assert client.get("/items/2").json() == ["item-2", True, value]
+        assert client.get("/sync").json() == id(created[0])
+
+    assert len(created) == 1
+
+
+def test_singleton_request_dependency():
+    singleton_cbv = CBV(FastAPI(), lifetime="singleton")
+
+    class Routes:
+        an_value = provider
+
+        @singleton_cbv.get("/")
+        def api(self): ...
+
+    with pytest.raises(TypeError):
+        singleton_cbv(Routes)
+
+
+@pytest.mark.parametrize(
+    "dependency",
+    [
+        lambda request: request,
+        lambda q=Query(1): q,
+        lambda value=Depends(lambda request: request): value,
+        lambda value=provider: value,
+    ],
+)
+def test_singleton_depends_on_request(dependency):
+    singleton_cbv = CBV(FastAPI(), lifetime="singleton")
+
+    class Routes:
+        value: Annotated[Any, Depends(dependency)]
+
+        @singleton_cbv.get("/")
+        def api(self): ...
+
+    # 在装饰时失败, 而不是在第一个请求中返回 500
+    with pytest.raises(TypeError, match="outside a request"):
+        singleton_cbv(Routes)
+
+
+def test_pooled():
+    pooled_app = FastAPI()
+    pooled_cbv = CBV(pooled_app, lifetime="pooled", pool_size=1)
+    ids = []
+
+    @pooled_cbv
+    class Routes:
+        __slots__ = ("__dict__", "count")
+
+        count: Annotated[int, Depends(lambda: 1)]
+
+        @pooled_cbv.get("/")
+        async def api(self, number: int):
+            ids.append(id(self))
+            # 上一个请求设置的属性不会泄漏到下一个请求
+            leaked = hasattr(self, "number")
+            self.number = number
+            self.count += number
+            return [self.count, leaked]
+
+    with TestClient(pooled_app) as client:
+        for number in range(3):
+            res = client.get("/", params={"number": number})
+            assert res.json() == [1 + number, False]
+
+    assert len(set(ids)) == 1
+
+
+def test_pooled_background_tasks():
+    pooled_app = FastAPI()
+    pooled_cbv = CBV(pooled_app, lifetime="pooled", pool_size=1)
+    names = []
+    ids = []
+
+    @pooled_cbv
+    class Routes:
+        name: Annotated[str, Query()]
+
+        def later(self):
+            names.append(self.name)
+
+        @pooled_cbv.get("/")
+        def api(self, background_tasks: BackgroundTasks):
+            ids.append(id(self))
+            # 端点的后台任务在实例归还之前执行
+            background_tasks.add_task(self.later)
+
+    with TestClient(pooled_app) as client:
+        client.get("/", params={"name": "a"})
+        client.get("/", params={"name": "b"})
+
+    assert names == ["a", "b"]
+    assert ids[0] == ids[1]
+
+
+path5 = "/5"
+
+
+@cbv
+class AsyncPostInitRoutes:
+    value: Annotated[int, Depends(lambda: 2)]
+
+    async def __post_init__(self):
+        await asyncio.sleep(0)
+        self.total = self.value * 10
+
+    @cbv.get(path5)
+    async def api(self):
+        return self.total
+
+    @cbv.get(f"{path5}/sync")
+    def sync_api(self):
+        return self.total
+
+
+def test_async_post_init():
+    test_client = TestClient(app)
+
+    assert test_client.get(path5).json() == 20  # noqa: PLR2004
+    assert test_client.get(f"{path5}/sync").json() == 20  # noqa: PLR2004
+
+
+def test_responses():
+    responses_app = FastAPI()
+    responses_cbv = CBV(responses_app)
+
+    @responses_cbv
+    class Routes:
+        @responses_cbv.responses(AError)
+        @responses_cbv.get("/a")
+        @responses_cbv.post("/a")
+        def a(self): ...
+
+        @responses_cbv.responses(BError)
+        @responses_cbv.get("/b")
+        def b(self): ...
+
+    paths = responses_app.openapi()["paths"]
+    for method in ("get", "post"):
+        assert str(AError.status) in paths["/a"][method]["responses"]
+        assert str(BError.status) not in paths["/a"][method]["responses"]
+    assert str(BError.status) in paths["/b"]["get"]["responses"]
+
+
+def test_pooled_streaming():
+    pooled_app = FastAPI()
+    pooled_cbv = CBV(pooled_app, lifetime="pooled", pool_size=1)
+    ids = []
+
+    @pooled_cbv
+    class Routes:
+        name: Annotated[str, Query()]
+
+        @pooled_cbv.get("/stream")
+        async def stream(self):
+            ids.append(id(self))
+
+            async def body():
+                await asyncio.sleep(0)
+                # 响应发送完毕之前, 实例不会被清空或被其他请求使用
+                yield self.name
+
+            return StreamingResponse(body())
+
+        @pooled_cbv.get("/background")
+        async def background(self):
+            ids.append(id(self))
+            return JSONResponse(
+                self.name,
+                background=BackgroundTask(lambda: ids.append(self.name)),
+            )
+
+    with TestClient(pooled_app) as client:
+        assert client.get("/stream", params={"name": "a"}).text == "a"
+        assert client.get("/stream", params={"name": "b"}).text == "b"
+        # 响应结束后放回了对象池
+        assert ids[0] == ids[1]
+
+        # 响应自带后台任务时, 实例不再放回对象池
+        assert client.get("/background", params={"name": "c"}).json() == "c"
+        assert ids[-1] == "c"
+        client.get("/stream", params={"name": "d"})
+        assert ids[-1] != ids[0]
@@ -1,4 +1,16 @@
-from fastapi_exts.exceptions import HTTPProblem
+import json
+from typing import ClassVar
+
+from pydantic import BaseModel
+
+from fastapi_exts.exceptions import (
+    BaseHTTPDataError,
+    HTTPProblem,
+    NamedHTTPError,
+    create_ext_http_error_handler,
+    ext_http_error_handler,
+    get_schema,
+)
 
 
 class WTF(HTTPProblem):
@@ -10,3 +22,128 @@ def test_http_problem():
     data = WTF().data
     assert data.type == "urn:problem-type:wtf"
     assert data.title == "WTF"
+
+
+def test_schema_is_built_once():
+    class NotFoundError(NamedHTTPError):
+        status = 404
+        targets = ("user",)
+
+    schema = type(NotFoundError(target="user").data)
+    assert type(NotFoundError(target="user").data) is schema
+    assert get_schema(NotFoundError) is schema
+
+    NotFoundError.code = "Missing"
+    assert get_schema(NotFoundError) is not schema
+    assert NotFoundError(target="user").data.code == "Missing"
+
+
+def test_problem_schema_invalidation():
+    class Gone(HTTPProblem):
+        status = 410
+        title = "Gone"
+
+    schema = get_schema(Gone)
+    assert type(Gone().data) is schema
+
+    Gone.title = "Removed"
+    assert Gone().data.title == "Removed"
+    assert get_schema(Gone) is not schema
+
+
+def test_cached_error_handler():
+    class ForbiddenError(NamedHTTPError):
+        status = 403
+        message = "forbidden"
+
+    handler = create_ext_http_error_handler()
+
+    response = handler(None, ForbiddenError())
+    assert response.body == ext_http_error_handler(None, ForbiddenError()).body
+    assert response.headers["content-type"] == "application/json"
+
+    # 直接赋值的 data 不使用缓存的响应体
+    class QuotaError(NamedHTTPError):
+        status = 429
+        __build_schema_kwargs__: ClassVar = {"limit": (int, ...)}
+
+        def __init__(self, limit: int) -> None:
+            super().__init__()
+            self.data = get_schema(type(self))(
+                code="Quota", message="quota exceeded", limit=limit
+            )
+
+        def get_data_kwargs(self):
+            return {**super().get_data_kwargs(), "limit": 0}
+
+    for limit in [1, 2]:
+        response = handler(None, QuotaError(limit))
+        assert json.loads(response.body)["limit"] == limit
+
+    response = handler(None, ForbiddenError(message="no access"))
+    assert json.loads(response.body)["message"] == "no access"
+
+    response = handler(None, WTF(detail="why"))
+    assert response.headers["content-type"] == "application/problem+json"
+    assert json.loads(response.body)["detail"] == "why"
+
+
+def test_assigned_data_without_data_kwargs():
+    class Payload(BaseModel):
+        reason: str
+
+    # 直接继承 `BaseHTTPDataError`, 只赋值 data
+    class RawError(BaseHTTPDataError[Payload]):
+        status = 409
+
+        @classmethod
+        def build_schema(cls):
+            return Payload
+
+        def __init__(self, reason: str) -> None:
+            self.data = Payload(reason=reason)
+
+    # 不调用 `super().__init__()`
+    class BareError(NamedHTTPError):
+        status = 410
+
+        def __init__(self) -> None:
+            self.data = get_schema(type(self))(code="Bare", message="gone")
+
+    handler = create_ext_http_error_handler()
+    response = handler(None, RawError("conflict"))
+    assert json.loads(response.body) == {"reason": "conflict"}
+    response = handler(None, BareError())
+    assert json.loads(response.body)["message"] == "gone"
+
+
+def test_lazy_data():
+    built = []
+
+    class LazyError(NamedHTTPError):
+        __lazy_data__ = True
+        status = 404
+        targets = ("user",)
+        message = "{target} not found"
+
+        def build_data(self):
+            built.append(self)
+            return super().build_data()
+
+    error = LazyError(target="user")
+    assert built == []
+
+    assert error.data.message == "user not found"
+    assert error.data is error.data
+    assert built == [error]
+
+    # 静态的响应体命中缓存后不会构建 data
+    class LazyStaticError(LazyError):
+        targets = None
+        message = "not found"
+
+    handler = create_ext_http_error_handler()
+    body = handler(None, LazyStaticError()).body
+    built.clear()
+    assert handler(None, LazyStaticError()).body == body
+    assert built == []
@@ -0,0 +1,307 @@
+import asyncio
+import json
+from datetime import UTC, datetime
+from typing import NamedTuple
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import Field, ValidationError, create_model, field_validator
+
+from fastapi_exts.models import APIModel, Model
+from fastapi_exts.pagination import (
+    _CACHE_SIZE,
+    APIPage,
+    APIPageParamsModel,
+    CursorCodec,
+    CursorParamsModel,
+    InvalidCursorError,
+    Page,
+    PageParamsModel,
+    PageResponse,
+    ResultsFormatParam,
+    _get_list_adapter,
+    api_page,
+    cursor_page,
+    dump_columnar,
+    page,
+    stream_page,
+    validate_results,
+)
+
+
+validated: list[int] = []
+
+
+class Item(Model):
+    id: int
+    name: str
+
+    @field_validator("id")
+    @classmethod
+    def _record(cls, value: int):
+        validated.append(value)
+        return value
+
+
+class ItemTuple(NamedTuple):
+    id: int
+    name: str
+
+
+class ItemObject:
+    def __init__(self, id: int, name: str) -> None:  # noqa: A002
+        self.id = id
+        self.name = name
+
+
+@pytest.mark.parametrize(
+    "results",
+    [
+        [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}],
+        [ItemTuple(1, "a"), ItemTuple(2, "b")],
+        (ItemObject(i, name) for i, name in [(1, "a"), (2, "b")]),
+    ],
+)
+def test_page(results):
+    validated.clear()
+
+    result = page(Item, PageParamsModel(page_size=2, page_no=1), 5, results)
+    # 每一行只校验一次
+    assert validated == [1, 2]
+
+    assert isinstance(result, Page)
+    assert result.page_count == 3  # noqa: PLR2004
+    assert result.results == [Item(id=1, name="a"), Item(id=2, name="b")]
+
+
+def test_api_page():
+    pagination = APIPageParamsModel(page_size=10, page_no=2)
+    result = api_page(Item, pagination, 11, [{"id": 1, "name": "a"}])
+
+    assert isinstance(result, APIPage)
+    assert result.model_dump(by_alias=True) == {
+        "pageSize": 10,
+        "pageNo": 2,
+        "pageCount": 2,
+        "count": 11,
+        "results": [{"id": 1, "name": "a"}],
+    }
+
+
+def test_invalid_results():
+    with pytest.raises(ValidationError):
+        page(Item, PageParamsModel(), 1, [{"id": "a"}])
+
+
+def test_list_adapter_cache_is_bounded():
+    for index in range(_CACHE_SIZE + 10):
+        model = create_model(f"Dynamic{index}", id=(int, ...))
+        assert validate_results(model, [{"id": index}])[0].id == index
+
+    assert _get_list_adapter.cache_info().currsize == _CACHE_SIZE
+
+
+def test_cursor_codec():
+    codec = CursorCodec("secret")
+    values = [datetime(2024, 1, 1, tzinfo=UTC), 1, "a"]
+
+    cursor = codec.encode(values)
+    assert codec.decode(cursor) == ["2024-01-01T00:00:00Z", 1, "a"]
+
+    for invalid in [
+        cursor[:-2],
+        f"{cursor}a",
+        "!",
+        CursorCodec("other").encode(values),
+    ]:
+        with pytest.raises(InvalidCursorError):
+            codec.decode(invalid)
+
+
+def test_cursor_page():
+    codec = CursorCodec("secret")
+    rows = [{"id": i, "name": str(i)} for i in range(3)]
+
+    result = cursor_page(
+        Item,
+        CursorParamsModel(page_size=2),
+        rows,
+        codec=codec,
+        key=lambda row: [row["id"]],
+    )
+    assert [i.id for i in result.results] == [0, 1]
+    assert result.next_cursor is not None
+    assert codec.decode(result.next_cursor) == [1]
+
+    result = cursor_page(
+        Item,
+        CursorParamsModel(page_size=3),
+        rows,
+        codec=codec,
+        key=lambda row: [row["id"]],
+    )
+    assert result.next_cursor is None
+
+
+def stream(results, **kwargs):
+    response = stream_page(Item, results, **kwargs)
+
+    async def read():
+        return [i async for i in response.body_iterator]
+
+    return response.media_type, asyncio.run(read())
+
+
+async def aiter_rows(rows: list):
+    for row in rows:
+        yield row
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_stream_page_json(is_async: bool):  # noqa: FBT001
+    rows = [{"id": i, "name": str(i)} for i in range(5)]
+    validated.clear()
+
+    content_type, chunks = stream(
+        aiter_rows(rows) if is_async else iter(rows),
+        pagination=APIPageParamsModel(page_size=5, page_no=2),
+        batch_size=2,
+    )
+    assert content_type == "application/json"
+    assert validated == [0, 1, 2, 3, 4]
+    # 开头, 3 批结果, 结尾
+    assert len(chunks) == 5  # noqa: PLR2004
+    assert json.loads(b"".join(chunks)) == {
+        "results": rows,
+        "pageSize": 5,
+        "pageNo": 2,
+        "count": 5,
+    }
+
+
+def test_stream_page_ndjson():
+    rows = [{"id": i, "name": str(i)} for i in range(3)]
+
+    content_type, chunks = stream(iter(rows), stream_format="ndjson")
+    assert content_type == "application/x-ndjson"
+    lines = b"".join(chunks).splitlines()
+    assert [json.loads(i) for i in lines] == [*rows, {"trailer": {"count": 3}}]
+
+    _, chunks = stream([], stream_format="ndjson")
+    assert b"".join(chunks) == b'{"trailer":{"count":0}}\n'
+
+    _, chunks = stream([])
+    assert json.loads(b"".join(chunks)) == {"results": [], "count": 0}
+
+
+def test_page_response():
+    pagination = APIPageParamsModel(page_size=10, page_no=1)
+    rows = [{"id": i, "name": str(i)} for i in range(3)]
+    app = FastAPI()
+
+    @app.get("/default")
+    def default() -> APIPage[Item]:
+        return api_page(Item, pagination, 3, rows)
+
+    @app.get("/direct", response_class=PageResponse)
+    def direct() -> APIPage[Item]:
+        return PageResponse(api_page(Item, pagination, 3, rows))
+
+    @app.get("/response-class", response_class=PageResponse)
+    def response_class() -> APIPage[Item]:
+        return api_page(Item, pagination, 3, rows)
+
+    with TestClient(app) as client:
+        expected = client.get("/default").content
+        assert b'"pageSize":10' in expected
+
+        validated.clear()
+        assert client.get("/direct").content == expected
+        assert validated == [0, 1, 2]
+        assert client.get("/response-class").content == expected
+
+        paths = client.get("/openapi.json").json()["paths"]
+        schemas = {
+            path: paths[path]["get"]["responses"]["200"]["content"]
+            for path in ["/default", "/direct"]
+        }
+        assert schemas["/default"] == schemas["/direct"]
+
+
+class Tag(APIModel):
+    tag_name: str
+
+
+class Row(APIModel):
+    row_id: int
+    created_at: datetime
+    tags: list[Tag]
+    secret: str = Field("", exclude=True)
+
+
+def test_dump_columnar():
+    pagination = APIPageParamsModel(page_size=2)
+    rows = [
+        {
+            "row_id": i,
+            "created_at": datetime(2024, 1, 1, tzinfo=UTC),
+            "tags": [{"tag_name": "a"}],
+        }
+        for i in range(2)
+    ]
+    result = api_page(Row, pagination, 2, rows)
+
+    assert json.loads(dump_columnar(result)) == {
+        "pageSize": 2,
+        "pageNo": 1,
+        "pageCount": 1,
+        "count": 2,
+        "results": {
+            "fields": ["rowId", "createdAt", "tags"],
+            "rows": [
+                [i, "2024-01-01T00:00:00Z", [{"tagName": "a"}]]
+                for i in range(2)
+            ],
+        },
+    }
+
+    result = page(Item, PageParamsModel(), 0, [])
+    assert json.loads(dump_columnar(result, by_alias=False))["results"] == {
+        "fields": ["id", "name"],
+        "rows": [],
+    }
+
+
+def test_results_format():
+    app = FastAPI()
+    rows = [{"id": 1, "name": "a"}]
+
+    @app.get("/", response_class=PageResponse)
+    def get_page(results_format: ResultsFormatParam) -> Page[Item]:
+        return PageResponse(
+            page(Item, PageParamsModel(), 1, rows),
+            results_format=results_format,
+        )
+
+    with TestClient(app) as client:
+        columnar = {"fields": ["id", "name"], "rows": [[1, "a"]]}
+        for params, accept, expected in [
+            ({}, None, rows),
+            ({"format": "columnar"}, None, columnar),
+            ({"format": "objects"}, "application/json;format=columnar", rows),
+            ({}, "text/html, application/json; format=columnar", columnar),
+            ({}, "text/html; format=columnar", rows),
+        ]:
+            headers = {} if accept is None else {"accept": accept}
+            response = client.get("/", params=params, headers=headers)
+            assert response.json()["results"] == expected
+            # 没有查询参数时格式由 `Accept` 决定
+            vary = response.headers.get("vary")
+            assert vary == (None if params else "Accept")
+
+        (parameter,) = app.openapi()["paths"]["/"]["get"]["parameters"]
+        assert parameter["name"] == "format"
+        assert "columnar" in parameter["description"]
+
+        assert client.get("/", params={"format": "a"}).status_code == 422  # noqa: PLR2004
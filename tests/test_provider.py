@@ -1,7 +1,18 @@
-from fastapi import APIRouter, FastAPI
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
 from fastapi.testclient import TestClient
 
-from fastapi_exts.provider import Provider, transform_providers
+from fastapi_exts.lifespan import Lifespan
+from fastapi_exts.provider import (
+    CachedProvider,
+    Provider,
+    transform_providers,
+)
+from fastapi_exts.routing import ExtAPIRouter
 
 
 def test_api_router():
@@ -28,3 +39,291 @@ def test_api_router():
 
     res = test_client.get(path)
     assert res.json() == value
+
+
+def test_concurrent_requests_isolation():
+    async def async_dependency(n: int):
+        await asyncio.sleep(0)
+        return n
+
+    def sync_dependency(n: int):
+        return n
+
+    router = APIRouter()
+
+    @router.get("/async")
+    @transform_providers
+    async def async_api(value=Provider(async_dependency)):
+        await asyncio.sleep(0)
+        return value.value
+
+    @router.get("/sync")
+    @transform_providers
+    def sync_api(value=Provider(sync_dependency)):
+        return value.value
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def request_all(path: str, total: int):
+        transport = httpx.ASGITransport(app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            responses = await asyncio.gather(
+                *(client.get(path, params={"n": i}) for i in range(total))
+            )
+        return [response.json() for response in responses]
+
+    total = 2000
+    assert asyncio.run(request_all("/async", total)) == list(range(total))
+    assert asyncio.run(request_all("/sync", total)) == list(range(total))
+
+
+def test_app_scope():
+    events = []
+
+    def get_config():
+        events.append("config")
+        return {"name": "client"}
+
+    config = Provider(get_config, scope="singleton")
+
+    async def create_client(config=config):
+        events.append("open")
+        yield config.value["name"]
+        events.append("close")
+
+    client = Provider(create_client, scope="app")
+
+    lifespan = Lifespan()
+    lifespan.on_provider(client)
+
+    router = ExtAPIRouter()
+
+    @router.get("/")
+    def api(client=client):
+        return client.value
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(router)
+
+    with TestClient(app) as test_client:
+        assert events == ["config", "open"]
+        for _ in range(3):
+            assert test_client.get("/").json() == "client"
+        assert events == ["config", "open"]
+
+    assert events == ["config", "open", "close"]
+
+
+def test_lazy_app_scope_cleanup():
+    events = []
+
+    async def create_pool():
+        events.append("open-pool")
+        yield "pool"
+        events.append("close-pool")
+
+    async def create_client():
+        events.append("open-client")
+        yield "client"
+        events.append("close-client")
+
+    pool = Provider(create_pool, scope="singleton")
+    client = Provider(create_client, scope="app")
+
+    def create_app(lifespan: Lifespan | None):
+        router = ExtAPIRouter()
+
+        @router.get("/")
+        def api(pool=pool, client=client):
+            return [pool.value, client.value]
+
+        app = FastAPI(lifespan=lifespan)
+        app.include_router(router)
+        return app
+
+    # 没有通过 `on_provider` 注册的依赖在关闭时也会清理
+    with TestClient(create_app(None)) as a:
+        assert a.get("/").json() == ["pool", "client"]
+        with TestClient(create_app(Lifespan())) as b:
+            assert b.get("/").json() == ["pool", "client"]
+        # 单例依赖仍被另一个应用使用
+        assert events.count("close-client") == 1
+        assert "close-pool" not in events
+    assert events.count("close-client") == 2  # noqa: PLR2004
+    assert events.count("close-pool") == 1
+
+
+def test_app_scope_dependency_overrides():
+    def get_url():
+        return "real"
+
+    def create_client(url=Depends(get_url)):
+        return f"client:{url}"
+
+    client = Provider(create_client, scope="app")
+
+    router = ExtAPIRouter()
+
+    @router.get("/")
+    def api(client=client):
+        return client.value
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_url] = lambda: "fake"
+
+    with TestClient(app) as test_client:
+        assert test_client.get("/").json() == "client:fake"
+
+
+def test_app_scope_rejects_request_dependency():
+    def dependency(request_value=Provider(lambda: 1)):
+        return request_value.value
+
+    provider = Provider(dependency, scope="app")
+
+    with pytest.raises(TypeError):
+        asyncio.run(provider.resolve())
+
+
+def test_cached_provider():
+    calls = []
+
+    def get_settings(tenant: int):
+        calls.append(tenant)
+        return {"tenant": tenant}
+
+    settings = CachedProvider(get_settings, maxsize=2)
+
+    router = ExtAPIRouter()
+
+    @router.get("/")
+    def api(settings=settings):
+        return settings.value
+
+    app = FastAPI()
+    app.include_router(router)
+    test_client = TestClient(app)
+
+    for tenant in [1, 1, 2, 1, 3, 2]:
+        assert test_client.get("/", params={"tenant": tenant}).json() == {
+            "tenant": tenant
+        }
+
+    # 3 进入缓存时淘汰了最久未使用的 2
+    assert calls == [1, 2, 3, 2]
+    assert settings.stats == (2, 4, 2, 2)
+
+
+def test_cached_provider_single_flight():
+    calls = []
+
+    async def get_flags(user: int):
+        calls.append(user)
+        await asyncio.sleep(0.01)
+        return user
+
+    flags = CachedProvider(get_flags, ttl=60)
+
+    router = ExtAPIRouter()
+
+    @router.get("/")
+    async def api(flags=flags):
+        return flags.value
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def request_all():
+        transport = httpx.ASGITransport(app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await asyncio.gather(
+                *(client.get("/", params={"user": 1}) for _ in range(50))
+            )
+
+    responses = asyncio.run(request_all())
+    assert {response.json() for response in responses} == {1}
+    assert calls == [1]
+
+
+def test_cached_provider_leader_cancelled():
+    calls = []
+
+    async def get_flags(user: int):
+        calls.append(user)
+        await asyncio.sleep(0.01)
+        return user
+
+    dependency = CachedProvider(get_flags).dependency
+
+    async def main():
+        leader = asyncio.create_task(dependency(user=1))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(dependency(user=1))
+        await asyncio.sleep(0)
+        leader.cancel()
+        # 等待者不会收到取消, 而是自己重新加载
+        return await follower
+
+    assert asyncio.run(main()) == 1
+    assert calls == [1, 1]
+
+
+def test_cached_provider_ttl(monkeypatch: pytest.MonkeyPatch):
+    now = [0.0]
+    calls = []
+
+    def get_value():
+        calls.append(now[0])
+        return len(calls)
+
+    provider = CachedProvider(get_value, ttl=10)
+    dependency = provider.dependency
+
+    monkeypatch.setattr("fastapi_exts.cache.monotonic", lambda: now[0])
+
+    assert dependency() == 1
+    now[0] = 9
+    assert dependency() == 1
+    now[0] = 10
+    assert dependency() == 2  # noqa: PLR2004
+
+    assert provider.stats.evictions == 1
+
+
+def test_inline_provider():
+    events = []
+
+    def get_thread():
+        return threading.get_ident()
+
+    def get_resource():
+        events.append("open")
+        yield threading.get_ident()
+        events.append("close")
+
+    router = ExtAPIRouter()
+
+    @router.get("/")
+    async def api(
+        thread=Provider(get_thread, inline=True),
+        resource=Provider(get_resource, inline=True),
+        default=Provider(get_thread),
+    ):
+        current = threading.get_ident()
+        return [
+            thread.value == current,
+            resource.value == current,
+            default.value == current,
+        ]
+
+    app = FastAPI()
+    app.include_router(router)
+
+    assert TestClient(app).get("/").json() == [True, True, False]
+    assert events == ["open", "close"]
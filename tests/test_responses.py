@@ -0,0 +1,58 @@
+from fastapi_exts.exceptions import HTTPProblem, NamedHTTPError
+from fastapi_exts.responses import (
+    _CACHE_SIZE,
+    _cached_build_responses,
+    build_responses,
+    error_responses,
+)
+
+
+class AError(NamedHTTPError):
+    status = 400
+
+
+class BError(NamedHTTPError):
+    status = 400
+
+
+class CProblem(HTTPProblem):
+    status = 409
+    title = "C"
+
+
+def test_build_responses_cache():
+    a = build_responses(AError, BError, CProblem)
+    b = build_responses(AError, BError, CProblem)
+
+    assert a == b
+    assert a is not b
+    assert a[400] is not b[400]
+    # 合并后的模型在各个路由间共享
+    assert a[400]["model"] is b[400]["model"]
+
+    a[400]["model"] = None
+    assert build_responses(AError, BError, CProblem)[400]["model"] is not None
+
+
+def test_error_responses_invalidation():
+    class DError(NamedHTTPError):
+        status = 404
+
+    old_status = DError.status
+    assert old_status in error_responses(DError)
+
+    DError.status = 410
+    responses = error_responses(DError)
+    assert old_status not in responses
+    assert DError.status in responses
+
+
+def test_responses_cache_is_bounded():
+    for status in range(400, 400 + _CACHE_SIZE + 10):
+        error_class = type(
+            "DynamicError", (NamedHTTPError,), {"status": status}
+        )
+        assert status in build_responses(error_class)
+
+    info = _cached_build_responses.cache_info()
+    assert info.currsize == _CACHE_SIZE
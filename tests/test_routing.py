@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import Depends, FastAPI
+from fastapi.routing import APIRoute
 from fastapi.testclient import TestClient
 
-from fastapi_exts.exceptions import NamedHTTPError
+from fastapi_exts.exceptions import (
+    BaseHTTPError,
+    NamedHTTPError,
+    ext_http_error_handler,
+)
 from fastapi_exts.provider import Provider
 from fastapi_exts.routing import ExtAPIRouter
 
@@ -41,3 +48,191 @@ def test_ext_api_router():
     openapi = app.openapi()
     assert str(AError.status) in openapi["paths"][path]["get"]["responses"]
     assert str(BError.status) in openapi["paths"][path]["get"]["responses"]
+
+
+def test_concurrent_providers():
+    sessions = []
+    cancelled = []
+    # 三个依赖都进入之后才能继续, 依次解析时会超时
+    barrier = asyncio.Barrier(3)
+
+    async def wait_others(name: str):
+        try:
+            async with asyncio.timeout(1):
+                await barrier.wait()
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+
+    def get_session():
+        sessions.append(object())
+        return sessions[-1]
+
+    async def get_user(user_id: int, session=Depends(get_session)):
+        await wait_others("user")
+        return (user_id, session)
+
+    async def get_tenant(tenant: str, session=Depends(get_session)):
+        await wait_others("tenant")
+        return (tenant, session)
+
+    async def get_quota(user_id: int):
+        if user_id < 0:
+            raise AError
+        await wait_others("quota")
+        return 10
+
+    router = ExtAPIRouter(concurrent_providers=True)
+
+    @router.get("/{user_id}")
+    async def api(
+        user=Provider(get_user),
+        tenant=Provider(get_tenant),
+        quota=Provider(get_quota),
+    ):
+        return [user.value[0], tenant.value[0], quota.value]
+
+    app = FastAPI()
+    app.exception_handlers[BaseHTTPError] = ext_http_error_handler
+    app.include_router(router)
+
+    # 所有请求在同一个事件循环中处理
+    with TestClient(app) as test_client:
+        res = test_client.get("/1", params={"tenant": "t"})
+        assert res.json() == [1, "t", 10]
+        # 子依赖依旧由 FastAPI 解析并缓存
+        assert len(sessions) == 1
+
+        # 一个依赖失败时取消其余的依赖
+        res = test_client.get("/-1", params={"tenant": "t"})
+        assert res.status_code == AError.status
+        assert sorted(cancelled) == ["tenant", "user"]
+
+
+def test_shared_provider_analyzed_once():
+    def get_session():
+        return 1
+
+    def get_user(session=Provider(get_session, exceptions=[BError])):
+        return session.value
+
+    current_user = Provider(get_user, exceptions=[AError])
+
+    router = ExtAPIRouter()
+
+    @router.get("/a")
+    def a(user=current_user):
+        return user.value
+
+    @router.get("/b")
+    def b(user=current_user):
+        return user.value
+
+    app = FastAPI()
+    app.include_router(router)
+
+    route_a, route_b = (
+        route for route in app.routes if isinstance(route, APIRoute)
+    )
+    assert (
+        route_a.dependant.dependencies[0].call
+        is route_b.dependant.dependencies[0].call
+    )
+
+    openapi = app.openapi()
+    for path in ["/a", "/b"]:
+        responses = openapi["paths"][path]["get"]["responses"]
+        assert str(AError.status) in responses
+        assert str(BError.status) in responses
+
+
+def test_endpoint_on_routers_with_different_concurrency():
+    async def get_user():
+        return "user"
+
+    async def get_tenant():
+        return "tenant"
+
+    async def api(user=Provider(get_user), tenant=Provider(get_tenant)):
+        return [user.value, tenant.value]
+
+    app = FastAPI()
+    for prefix, concurrent in [("/serial", False), ("/concurrent", True)]:
+        router = ExtAPIRouter(prefix=prefix, concurrent_providers=concurrent)
+        router.get("/")(api)
+        app.include_router(router)
+
+    serial, concurrent = (
+        route for route in app.routes if isinstance(route, APIRoute)
+    )
+
+    def sub_dependencies(route: APIRoute):
+        return {
+            dependency.dependencies[0].call
+            for dependency in route.dependant.dependencies
+        }
+
+    assert sub_dependencies(serial) == {get_user, get_tenant}
+    # 并发解析时两个 Provider 共用合并后的依赖
+    assert len(sub_dependencies(concurrent)) == 1
+
+    test_client = TestClient(app)
+    for prefix in ["/serial", "/concurrent"]:
+        assert test_client.get(f"{prefix}/").json() == ["user", "tenant"]
+
+
+def test_concurrent_providers_dependency_overrides():
+    async def get_a():
+        return "real-a"
+
+    async def get_b():
+        return "b"
+
+    async def fake_a(value: str = "fake-a"):
+        return value
+
+    router = ExtAPIRouter(concurrent_providers=True)
+
+    @router.get("/")
+    async def api(a=Provider(get_a), b=Provider(get_b)):
+        return [a.value, b.value]
+
+    app = FastAPI()
+    app.include_router(router)
+    test_client = TestClient(app)
+
+    assert test_client.get("/").json() == ["real-a", "b"]
+
+    # 覆盖的依赖由 FastAPI 解析, 参数也来自请求
+    app.dependency_overrides[get_a] = fake_a
+    assert test_client.get("/").json() == ["fake-a", "b"]
+    res = test_client.get("/", params={"value": "x"})
+    assert res.json() == ["x", "b"]
+
+
+def test_concurrent_providers_shared_with_depends():
+    calls = []
+
+    async def get_a():
+        calls.append("a")
+        return "a"
+
+    async def get_b():
+        return "b"
+
+    router = ExtAPIRouter(concurrent_providers=True)
+
+    @router.get("/")
+    async def api(
+        x=Depends(get_a),
+        a=Provider(get_a),
+        b=Provider(get_b),
+    ):
+        return [x, a.value, b.value]
+
+    app = FastAPI()
+    app.include_router(router)
+
+    # `get_a` 同时是普通依赖, 由 FastAPI 的缓存去重, 只执行一次
+    assert TestClient(app).get("/").json() == ["a", "a", "b"]
+    assert calls == ["a"]
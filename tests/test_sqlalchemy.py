@@ -0,0 +1,403 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import orm
+from sqlalchemy.dialects import postgresql
+
+from fastapi_exts.models import Model
+from fastapi_exts.pagination import (
+    APIPage,
+    CursorCodec,
+    CursorParamsModel,
+    InvalidCursorError,
+    PageParamsModel,
+    stream_page,
+)
+from fastapi_exts.sqlalchemy import (
+    CachedCount,
+    EstimatedCount,
+    IDBase,
+    Keyset,
+    NoCount,
+    fetch_api_page,
+    fetch_api_strategy_page,
+    fetch_page,
+    fetch_strategy_page,
+    page,
+)
+
+
+class Base(orm.DeclarativeBase): ...
+
+
+class Item(Base, IDBase[int]):
+    __tablename__ = "item"
+
+    created_at: orm.Mapped[datetime]
+    score: orm.Mapped[int]
+
+
+class ItemModel(Model):
+    id: int
+    created_at: datetime
+    score: int
+
+
+ROWS = 23
+START = datetime(2024, 1, 1)  # noqa: DTZ001
+
+
+def create_items():
+    return [
+        Item(
+            id=i + 1,
+            # 排序列的值有重复
+            created_at=START + timedelta(days=i // 4),
+            score=i % 3,
+        )
+        for i in range(ROWS)
+    ]
+
+
+@pytest.fixture(scope="module")
+def session():
+    # 流式响应在线程池中读取结果
+    engine = sa.create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=sa.StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with orm.Session(engine) as session:
+        session.add_all(create_items())
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def statements(session: orm.Session):
+    result: list[str] = []
+
+    def before_cursor_execute(*args):
+        result.append(args[2])
+
+    engine = session.get_bind()
+    sa.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield result
+    sa.event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def iter_pages(session: orm.Session, keyset: Keyset, page_size: int):
+    pagination = CursorParamsModel(page_size=page_size)
+    while True:
+        stmt = keyset.apply(sa.select(Item), pagination)
+        assert "OFFSET" not in str(stmt)
+
+        result = keyset.page(ItemModel, pagination, session.scalars(stmt))
+        yield result.results
+        if result.next_cursor is None:
+            return
+        pagination = CursorParamsModel(
+            page_size=page_size, cursor=result.next_cursor
+        )
+
+
+@pytest.mark.parametrize("row_values", [True, False])
+def test_keyset(session: orm.Session, row_values: bool):  # noqa: FBT001
+    keyset = Keyset(
+        Item,
+        Item.created_at.desc(),
+        codec=CursorCodec("secret"),
+        row_values=row_values,
+    )
+    # id 作为最后的排序列, 与其他排序列的方向一致时使用行值比较
+    assert keyset.row_values is row_values
+    items = session.scalars(sa.select(Item)).all()
+    expected = sorted(items, key=lambda i: (i.created_at, i.id), reverse=True)
+
+    pages = list(iter_pages(session, keyset, 5))
+    assert [len(i) for i in pages] == [5, 5, 5, 5, 3]
+    assert [i.id for page in pages for i in page] == [i.id for i in expected]
+
+
+def test_keyset_mixed_directions(session: orm.Session):
+    keyset = Keyset(
+        Item,
+        Item.score.desc(),
+        Item.created_at,
+        codec=CursorCodec("secret"),
+    )
+    assert not keyset.row_values
+    items = session.scalars(sa.select(Item)).all()
+    expected = sorted(items, key=lambda i: (-i.score, i.created_at, i.id))
+
+    pages = list(iter_pages(session, keyset, 4))
+    assert [i.id for page in pages for i in page] == [i.id for i in expected]
+
+
+def test_keyset_invalid_cursor():
+    keyset = Keyset(Item, Item.created_at, codec=CursorCodec("secret"))
+
+    for values in [[1], ["not a datetime", 1]]:
+        pagination = CursorParamsModel(cursor=keyset.codec.encode(values))
+        with pytest.raises(InvalidCursorError):
+            keyset.apply(sa.select(Item), pagination)
+
+
+SCORE_ZERO = [i + 1 for i in range(ROWS) if i % 3 == 0]
+
+
+def test_fetch_page(session: orm.Session, statements: list[str]):
+    stmt = sa.select(Item).where(Item.score == 0).order_by(Item.id)
+    pagination = PageParamsModel(page_size=3, page_no=2)
+
+    result = fetch_page(ItemModel, pagination, stmt, session)
+
+    # 总数与当前页只查询一次
+    assert len(statements) == 1
+    assert result.count == len(SCORE_ZERO)
+    assert result.page_count == 3  # noqa: PLR2004
+    assert [i.id for i in result.results] == SCORE_ZERO[3:6]
+
+
+def test_fetch_page_columns(session: orm.Session):
+    stmt = sa.select(Item.id, Item.created_at, Item.score).order_by(Item.id)
+    pagination = PageParamsModel(page_size=5, page_no=1)
+
+    for executor in (session, session.connection()):
+        result = fetch_api_page(ItemModel, pagination, stmt, executor)
+        assert isinstance(result, APIPage)
+        assert result.count == ROWS
+        assert [i.id for i in result.results] == [1, 2, 3, 4, 5]
+
+
+class ScoreModel(Model):
+    score: int
+
+
+def test_fetch_page_distinct(session: orm.Session, statements: list[str]):
+    stmt = sa.select(Item.score).distinct().order_by(Item.score)
+    pagination = PageParamsModel(page_size=2, page_no=1)
+
+    result = fetch_page(ScoreModel, pagination, stmt, session)
+
+    # 窗口函数在 DISTINCT 之前计算, 总数需要单独查询
+    assert len(statements) == 2  # noqa: PLR2004
+    assert result.count == 3  # noqa: PLR2004
+    assert [i.score for i in result.results] == [0, 1]
+
+
+def test_fetch_page_out_of_range(session: orm.Session, statements: list[str]):
+    stmt = sa.select(Item).where(Item.score == 0)
+    pagination = PageParamsModel(page_size=5, page_no=10)
+
+    result = fetch_page(ItemModel, pagination, stmt, session)
+
+    # 没有结果时需要单独查询总数
+    assert len(statements) == 2  # noqa: PLR2004
+    assert result.count == len(SCORE_ZERO)
+    assert result.results == []
+
+
+def test_page_keywords(session: orm.Session):
+    result = page(
+        model_class=ItemModel,
+        pagination=PageParamsModel(),
+        count=ROWS,
+        results=session.scalars(sa.select(Item)),
+    )
+    assert len(result.results) == ROWS
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_async_fetch_page(tmp_path, concurrent: bool):  # noqa: FBT001
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext import asyncio as asa
+
+    engine = asa.create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/db")
+    stmt = sa.select(Item).where(Item.score == 0).order_by(Item.id)
+    pagination = PageParamsModel(page_size=3, page_no=2)
+
+    async def main():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with asa.AsyncSession(engine) as session:
+            session.add_all(create_items())
+            await session.commit()
+
+            results = [
+                await fetch_page(
+                    ItemModel, pagination, stmt, engine, concurrent=concurrent
+                ),
+                await fetch_page(ItemModel, pagination, stmt, session),
+            ]
+        await engine.dispose()
+        return results
+
+    for result in asyncio.run(main()):
+        assert result.count == len(SCORE_ZERO)
+        assert [i.id for i in result.results] == SCORE_ZERO[3:6]
+
+
+class SQLiteEstimatedCount(EstimatedCount):
+    """SQLite 没有行数估计, 固定返回一个估计值"""
+
+    estimate = 1000
+
+    def estimate_statement(self, stmt, dialect):  # noqa: ARG002
+        return sa.select(sa.literal(self.estimate))
+
+    def parse_estimate(self, result):
+        return result.scalar_one()
+
+
+def test_strategy_page(session: orm.Session, statements: list[str]):
+    stmt = sa.select(Item).where(Item.score == 0).order_by(Item.id)
+    pagination = PageParamsModel(page_size=3, page_no=1)
+
+    result = fetch_strategy_page(ItemModel, pagination, stmt, session)
+    assert result.count_strategy == "exact"
+    assert result.count == len(SCORE_ZERO)
+    assert result.has_next
+    assert len(statements) == 1
+
+
+def test_cached_count(session: orm.Session, statements: list[str]):
+    strategy = CachedCount(ttl=None)
+    pagination = PageParamsModel(page_size=3, page_no=1)
+
+    def fetch(score: int):
+        stmt = sa.select(Item).where(Item.score == score)
+        return fetch_api_strategy_page(
+            ItemModel, pagination, stmt, session, strategy=strategy
+        )
+
+    assert fetch(0).count_strategy == "exact"
+    result = fetch(0)
+    assert result.count_strategy == "cached"
+    assert result.count == len(SCORE_ZERO)
+    assert result.has_next
+    assert len(result.results) == pagination.page_size
+    # 参数不同时使用不同的缓存
+    assert fetch(1).count_strategy == "exact"
+
+    assert len(statements) == 3  # noqa: PLR2004
+    assert strategy.stats.hits == 1
+    assert strategy.stats.size == 2  # noqa: PLR2004
+
+
+def test_estimated_count(session: orm.Session, statements: list[str]):
+    strategy = SQLiteEstimatedCount()
+    stmt = sa.select(Item).where(Item.score == 0).order_by(Item.id)
+
+    pagination = PageParamsModel(page_size=3, page_no=1)
+    result = fetch_strategy_page(
+        ItemModel, pagination, stmt, session, strategy=strategy
+    )
+    assert result.count_strategy == "estimated"
+    assert result.count == strategy.estimate
+    assert result.has_next
+    assert len(statements) == 2  # noqa: PLR2004
+
+    # 最后一页的总数是精确的
+    pagination = PageParamsModel(page_size=3, page_no=3)
+    result = fetch_strategy_page(
+        ItemModel, pagination, stmt, session, strategy=strategy
+    )
+    assert result.count_strategy == "exact"
+    assert result.count == len(SCORE_ZERO)
+    assert not result.has_next
+    assert len(statements) == 3  # noqa: PLR2004
+
+    pagination = PageParamsModel(page_size=3, page_no=1)
+    with pytest.raises(NotImplementedError):
+        fetch_strategy_page(
+            ItemModel, pagination, stmt, session, strategy=EstimatedCount()
+        )
+
+
+def test_postgresql_estimate():
+    strategy = EstimatedCount()
+    dialect = postgresql.dialect()
+    stmt = sa.select(Item).where(
+        Item.score == 0,
+        sa.cast(Item.score, sa.String) != "hi :alice",
+    )
+
+    compiled = strategy.estimate_statement(stmt, dialect).compile(
+        dialect=dialect
+    )
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT")
+    # 值以绑定参数传递, 不会拼接到语句中
+    assert "alice" not in str(compiled)
+    assert sorted(compiled.params.values(), key=str) == [0, "hi :alice"]
+
+    class Result:
+        def scalar_one(self):
+            return '[{"Plan": {"Plan Rows": 42}}]'
+
+    assert strategy.parse_estimate(Result()) == 42  # noqa: PLR2004
+
+
+def test_no_count(session: orm.Session):
+    stmt = sa.select(Item).order_by(Item.id)
+
+    for page_no, has_next in [(4, True), (5, False)]:
+        pagination = PageParamsModel(page_size=5, page_no=page_no)
+        result = fetch_strategy_page(
+            ItemModel, pagination, stmt, session, strategy=NoCount()
+        )
+        assert result.count_strategy == "none"
+        assert result.count is None
+        assert result.page_count is None
+        assert result.has_next is has_next
+
+
+def test_stream_page(session: orm.Session, statements: list[str]):
+    app = FastAPI()
+
+    @app.get("/")
+    def export():
+        stmt = sa.select(Item).execution_options(yield_per=5)
+        results = session.scalars(stmt.order_by(Item.id))
+        return stream_page(ItemModel, results, stream_format="ndjson")
+
+    with TestClient(app) as client:
+        lines = client.get("/").content.splitlines()
+
+    assert len(statements) == 1
+    assert [json.loads(i)["id"] for i in lines[:-1]] == list(
+        range(1, ROWS + 1)
+    )
+    assert json.loads(lines[-1]) == {"trailer": {"count": ROWS}}
+
+
+def test_stream_page_async():
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        async with AsyncSession(engine) as session:
+            session.add_all(create_items())
+            await session.commit()
+            results = await session.stream_scalars(
+                sa.select(Item).order_by(Item.id)
+            )
+            response = stream_page(ItemModel, results, batch_size=4)
+            body = b"".join([i async for i in response.body_iterator])
+
+        await engine.dispose()
+        return json.loads(body)
+
+    body = asyncio.run(main())
+    assert [i["id"] for i in body["results"]] == list(range(1, ROWS + 1))
+    assert body["count"] == ROWS
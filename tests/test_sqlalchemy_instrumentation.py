@@ -0,0 +1,158 @@
+import asyncio
+import re
+from pathlib import Path
+from time import sleep
+from typing import Annotated, Any
+
+import pytest
+import sqlalchemy as sa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import orm
+
+from fastapi_exts.sqlalchemy import (
+    ServerTimingMiddleware,
+    create_engine_dependency,
+    create_session_dependency,
+    instrument_pool,
+)
+from fastapi_exts.sqlalchemy.instrumentation import (
+    RequestTiming,
+    _on_session_begin,
+    track_session,
+)
+
+
+HOLD = 0.05
+
+
+@pytest.fixture
+def engine(tmp_path: Path):
+    engine = sa.create_engine(
+        f"sqlite:///{tmp_path / 'db.sqlite'}",
+        poolclass=sa.QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    yield engine
+    engine.dispose()
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    return {
+        name: float(duration)
+        for name, duration in re.findall(r"([\w-]+);dur=([\d.]+)", header)
+    }
+
+
+def create_app(dependency: Any):
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/")
+    def endpoint(db: Annotated[Any, Depends(dependency)]):
+        db.execute(sa.text("SELECT 1"))
+        sleep(HOLD)
+
+    return app
+
+
+def test_engine_dependency(engine: sa.Engine):
+    app = create_app(create_engine_dependency(engine, instrument=True))
+
+    with TestClient(app) as client:
+        response = client.get("/")
+
+    timing = parse_server_timing(response.headers["server-timing"])
+    assert timing.keys() == {"db-wait", "db-hold"}
+    assert timing["db-hold"] >= HOLD * 1e3
+
+    stats = instrument_pool(engine).stats()
+    assert stats.checkouts == 1
+    assert stats.hold_total >= HOLD
+    assert stats.size == 1
+    assert stats.checked_out == 0
+
+
+def test_session_dependency(engine: sa.Engine):
+    get_session = create_session_dependency(
+        orm.sessionmaker(engine),
+        instrument=True,
+        timing_name="session",
+    )
+    app = create_app(get_session)
+
+    with TestClient(app) as client:
+        response = client.get("/")
+
+    timing = parse_server_timing(response.headers["server-timing"])
+    assert timing["session-hold"] >= HOLD * 1e3
+
+    # 重新创建连接池后, 第一个连接归还之后继续记录
+    engine.dispose()
+    with TestClient(app) as client:
+        client.get("/")
+        assert instrument_pool(engine).stats().checkouts == 1
+        client.get("/")
+    assert instrument_pool(engine).stats().checkouts == 2  # noqa: PLR2004
+
+    with pytest.raises(ValueError, match="bound"):
+        create_session_dependency(orm.sessionmaker(), instrument=True)
+
+
+def test_timeout(engine: sa.Engine):
+    instrument = instrument_pool(engine)
+
+    with engine.connect():
+        with pytest.raises(sa.exc.TimeoutError):
+            engine.connect()
+
+        stats = instrument.stats()
+        assert stats.timeouts == 1
+        assert stats.checked_out == 1
+        assert stats.overflow == 0
+
+    stats = instrument.stats()
+    assert stats.checkouts == 1
+    assert stats.checked_out == 0
+
+    instrument.reset()
+    assert instrument.stats().timeouts == 0
+
+
+def test_async_session_dependency(tmp_path: Path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'db'}")
+    get_session = create_session_dependency(
+        async_sessionmaker(engine), instrument=True
+    )
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/")
+    async def endpoint(session: Annotated[Any, Depends(get_session)]):
+        await session.execute(sa.text("SELECT 1"))
+        await asyncio.sleep(HOLD)
+
+    with TestClient(app) as client:
+        response = client.get("/")
+
+    timing = parse_server_timing(response.headers["server-timing"])
+    assert timing["db-hold"] >= HOLD * 1e3
+    assert instrument_pool(engine).stats().checkouts == 1
+
+
+def test_track_session_scope(engine: sa.Engine):
+    timing = RequestTiming("db")
+    with orm.Session(engine) as tracked:
+        track_session(tracked, timing)
+        tracked.execute(sa.text("SELECT 1"))
+    with orm.Session(engine) as other:
+        other.execute(sa.text("SELECT 1"))
+
+    # 只监听被跟踪的会话, 不会在 `Session` 类上注册全局的监听器
+    assert not sa.event.contains(orm.Session, "after_begin", _on_session_begin)
+    assert timing.checkouts == 1
@@ -0,0 +1,206 @@
+from pathlib import Path
+from typing import Annotated, Any
+
+import pytest
+import sqlalchemy as sa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import orm
+
+from fastapi_exts.sqlalchemy import (
+    ReplicaSet,
+    RoutingSession,
+    create_routing_session_dependency,
+    read_only,
+    read_write,
+)
+
+
+class Base(orm.DeclarativeBase): ...
+
+
+class Source(Base):
+    __tablename__ = "source"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    name: orm.Mapped[str]
+
+
+def create_database(path: Path, name: str) -> str:
+    url = f"sqlite:///{path / name}.db"
+    engine = sa.create_engine(url)
+    Base.metadata.create_all(engine)
+    with orm.Session(engine) as session:
+        session.add(Source(id=1, name=name))
+        session.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def urls(tmp_path: Path):
+    return {
+        name: create_database(tmp_path, name)
+        for name in ["primary", "replica1", "replica2"]
+    } | {
+        # 只读模式打开不存在的文件, 连接时失败
+        "broken": f"sqlite:///file:{tmp_path / 'broken'}.db?mode=ro&uri=true",
+    }
+
+
+def read_source(session: orm.Session) -> str:
+    stmt = sa.select(Source.name).where(Source.id == 1)
+    return session.scalars(stmt).one()
+
+
+def create_app(
+    urls: dict[str, str],
+    replicas: list[str],
+    *,
+    probe: bool = False,
+):
+    primary = sa.create_engine(urls["primary"])
+    get_session = create_routing_session_dependency(
+        orm.sessionmaker(primary, class_=RoutingSession),
+        ReplicaSet([sa.create_engine(urls[i]) for i in replicas], probe=probe),
+    )
+    SessionDep = Annotated[orm.Session, Depends(get_session)]  # noqa: N806
+    app = FastAPI()
+
+    @app.get("/")
+    def get(session: SessionDep):
+        return read_source(session)
+
+    @app.post("/")
+    def post(session: SessionDep):
+        return read_source(session)
+
+    @app.get("/write")
+    def write(session: SessionDep):
+        before = read_source(session)
+        session.add(Source(id=2, name="new"))
+        session.flush()
+        return [before, read_source(session)]
+
+    @app.get("/text")
+    def write_text(session: SessionDep):
+        session.execute(sa.text("UPDATE source SET name = name"))
+        return read_source(session)
+
+    @app.get("/for-update")
+    def for_update(session: SessionDep):
+        stmt = sa.select(Source.name).where(Source.id == 1).with_for_update()
+        return session.scalars(stmt).one()
+
+    @app.post("/read-only")
+    @read_only
+    def post_read_only(session: SessionDep):
+        return read_source(session)
+
+    @app.get("/read-write")
+    @read_write
+    def get_read_write(session: SessionDep):
+        return read_source(session)
+
+    return app
+
+
+def test_routing(urls: dict[str, str]):
+    app = create_app(urls, ["replica1", "replica2"])
+
+    with TestClient(app) as client:
+        assert [client.get("/").json() for _ in range(4)] == [
+            "replica1",
+            "replica2",
+        ] * 2
+        assert client.post("/").json() == "primary"
+        assert client.post("/read-only").json().startswith("replica")
+        assert client.get("/read-write").json() == "primary"
+
+        # 写入之后读取主库
+        before, after = client.get("/write").json()
+        assert before.startswith("replica")
+        assert after == "primary"
+
+        # 无法判断是否写入的语句当作写入
+        assert client.get("/text").json() == "primary"
+        # 加锁的查询使用主库
+        assert client.get("/for-update").json() == "primary"
+
+
+def test_failover(urls: dict[str, str]):
+    app = create_app(urls, ["broken", "replica1"], probe=True)
+    with TestClient(app) as client:
+        assert {client.get("/").json() for _ in range(4)} == {"replica1"}
+
+    app = create_app(urls, ["broken"], probe=True)
+    with TestClient(app) as client:
+        assert client.get("/").json() == "primary"
+
+
+def test_least_in_flight(urls: dict[str, str]):
+    engines = [sa.create_engine(urls[i]) for i in ["replica1", "replica2"]]
+    replicas = ReplicaSet(engines, selection="least_in_flight")
+
+    first = replicas.acquire()
+    second = replicas.acquire()
+    assert {first, second} == {0, 1}
+    assert replicas.in_flight == [1, 1]
+
+    assert first is not None
+    replicas.release(first)
+    assert replicas.acquire() == first
+
+    replicas.mark_down(first)
+    assert replicas.acquire() == second
+    assert second is not None
+    assert replicas.in_flight[first] == 1
+    assert replicas.in_flight[second] == 2  # noqa: PLR2004
+
+    session = RoutingSession(engines[0], replicas=replicas, read_only=True)
+    session.get_bind()
+    session.close()
+    assert sum(replicas.in_flight) == 3  # noqa: PLR2004
+
+
+def test_async_routing(urls: dict[str, str]):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    def create_engine(name: str):
+        return create_async_engine(
+            urls[name].replace("sqlite://", "sqlite+aiosqlite://")
+        )
+
+    replicas = ReplicaSet(
+        [create_engine("broken"), create_engine("replica2")], probe=True
+    )
+    get_session = create_routing_session_dependency(
+        async_sessionmaker(
+            create_engine("primary"), sync_session_class=RoutingSession
+        ),
+        replicas,
+    )
+    app = FastAPI()
+
+    @app.api_route("/", methods=["GET", "POST"])
+    async def endpoint(session: Annotated[Any, Depends(get_session)]):
+        return (await session.scalars(sa.select(Source.name))).one()
+
+    with TestClient(app) as client:
+        assert [
+            client.get("/").json(),
+            client.get("/").json(),
+            client.post("/").json(),
+        ] == ["replica2", "replica2", "primary"]
+    assert replicas.in_flight == [0, 0]
+
+
+def test_invalid_arguments(urls: dict[str, str]):
+    primary = sa.create_engine(urls["primary"])
+
+    with pytest.raises(TypeError, match="RoutingSession"):
+        create_routing_session_dependency(orm.sessionmaker(primary), [])
+
+    with pytest.raises(ValueError, match="bound"):
+        ReplicaSet([orm.sessionmaker()])